@@ -1,9 +1,20 @@
+from hashlib import sha256
+
 from helper import (
     bits_to_target,
     hash256,
     int_to_little_endian,
     little_endian_to_int,
+    read_varint,
 )
+from merkle import merkle_root
+from tx import Tx
+
+HEADER_SIZE = 80
+
+# network magic in front of every block in blk*.dat files
+MAINNET_MAGIC = bytes.fromhex('f9beb4d9')
+TESTNET_MAGIC = bytes.fromhex('0b110907')
 
 class Block:
 
@@ -26,6 +37,29 @@ class Block:
         nonce = s.read(4) # nonce - 4 bytes
         return cls(version, prev_block, merkle_root, timestamp, bits, nonce)
 
+    @classmethod
+    def parse_stream(cls, s, testnet=False):
+        #Parses a full serialized block: returns the Block (header) and a generator of its Tx objects
+        # the transactions are read from s one at a time as the generator is
+        # consumed, so only one of them is ever in memory
+        # the generator remembers where it stopped and seeks back there if
+        # someone else moved the stream in between (read_blk_file does)
+        block = cls.parse(s)
+        block.tx_count = read_varint(s)
+        start = s.tell() if s.seekable() else None
+
+        def transactions():
+            position = start
+            for _ in range(block.tx_count):
+                if position is not None and s.tell() != position:
+                    s.seek(position)
+                tx = Tx.parse(s, testnet=testnet)
+                if position is not None:
+                    position = s.tell()
+                yield tx
+
+        return block, transactions()
+
     #appending all the block header info then later we'll hash it
     def serialize(self):
         #Returns the 80 byte block header
@@ -56,6 +90,10 @@ class Block:
         lowest = 0xffff * 256**(0x1d - 3)
         return lowest / self.target()
 
+    def validate_merkle_root(self, tx_hashes):
+        #whether the merkle root of tx_hashes (Tx.hash() of every tx, in block order) matches the header
+        return merkle_root(tx_hashes) == self.merkle_root
+
     def check_pow(self):
         #whether this block satisfies proof of work
         #proof-of-work can be calculated by computing the hash256 of the block header and interpreting this as a little-endian integer.
@@ -66,3 +104,42 @@ class Block:
         return proof < self.target()
 
 
+def check_pow_batch(headers, hashes=None):
+    #Checks proof of work of back to back 80 byte headers, returns a bytearray of 1 (pass) / 0 (fail) flags
+    # works straight on the buffer, no Block objects. targets are cached per
+    # distinct bits since those only change every 2016 blocks.
+    # pass a list as hashes to get every header's hash256 appended to it
+    if not isinstance(headers, bytes):
+        headers = memoryview(headers).cast('B')
+    if len(headers) % HEADER_SIZE:
+        raise ValueError('buffer is not a whole number of headers')
+    flags = bytearray(len(headers) // HEADER_SIZE)
+    targets = {}
+    for i, pos in enumerate(range(0, len(headers), HEADER_SIZE)):
+        bits = bytes(headers[pos + 72:pos + 76])
+        target = targets.get(bits)
+        if target is None:
+            target = targets[bits] = bits_to_target(bits)
+        h256 = sha256(sha256(headers[pos:pos + HEADER_SIZE]).digest()).digest()
+        if hashes is not None:
+            hashes.append(h256)
+        flags[i] = int.from_bytes(h256, 'little') < target
+    return flags
+
+
+def read_blk_file(f, magic=MAINNET_MAGIC, testnet=False):
+    #Yields (Block, transactions generator) for every block in a blk*.dat style file
+    # each record is magic (4 bytes) + block size (4 bytes, little endian) + block.
+    # whatever of a block's transactions wasn't consumed is skipped when the next
+    # block is asked for, so f has to be seekable. the zero padding at the end
+    # of preallocated files ends the iteration
+    while True:
+        record_magic = f.read(4)
+        if len(record_magic) < 4 or record_magic == b'\x00' * 4:
+            return
+        if record_magic != magic:
+            raise ValueError('bad magic {} at offset {}'.format(record_magic.hex(), f.tell() - 4))
+        size = little_endian_to_int(f.read(4))
+        end = f.tell() + size
+        yield Block.parse_stream(f, testnet=testnet)
+        f.seek(end)
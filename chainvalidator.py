@@ -0,0 +1,132 @@
+from struct import Struct
+
+from block import Block, HEADER_SIZE, check_pow_batch
+from helper import bits_to_target, calculate_new_bits
+
+
+# streaming validation of a header chain
+# headers are taken from a file, a buffer or any iterable of Blocks / raw
+# headers and checked batch by batch: each one has to point at the previous
+# header, satisfy its own proof of work and carry the expected bits, which
+# only change on 2016 block boundaries where they're recomputed from the
+# timestamps of the period that just ended. the validator only keeps the tip
+# and a handful of numbers, so memory doesn't grow with the chain.
+
+RETARGET_INTERVAL = 2016
+DEFAULT_BATCH_SIZE = 2016
+
+_unpack_timestamp = Struct('<I').unpack_from
+
+
+def block_work(bits):
+    #Expected number of hashes to find a header with these bits
+    return 2 ** 256 // (bits_to_target(bits) + 1)
+
+
+class ChainValidator:
+
+    def __init__(self, retarget=True):
+        # retarget=False for chains with fixed difficulty (regtest)
+        self.retarget = retarget
+        # height of the tip, -1 before the genesis header
+        self.height = -1
+        self.tip_hash = None
+        self.bits = None
+        self.chainwork = 0
+        self._last_timestamp = None
+        self._period_start_timestamp = None
+        # bits -> work, bits only change every 2016 headers
+        self._work = {}
+
+    def __repr__(self):
+        return 'ChainValidator(height={}, chainwork={:#x})'.format(self.height, self.chainwork)
+
+    @classmethod
+    def from_store(cls, store, retarget=True):
+        #A validator resuming at the tip of an already validated HeaderStore
+        # chainwork is summed from the stored bits, nothing else is rechecked
+        validator = cls(retarget=retarget)
+        if not len(store):
+            return validator
+        height = len(store) - 1
+        tip = store.get(height)
+        validator.height = height
+        validator.tip_hash = tip.hash()[::-1]
+        validator.bits = tip.bits
+        validator._last_timestamp = tip.timestamp
+        validator._period_start_timestamp = store.get(height - height % RETARGET_INTERVAL).timestamp
+        # a batch of headers at a time, the store can be far bigger than memory
+        for start in range(0, len(store), DEFAULT_BATCH_SIZE):
+            raw = store.raw_range(start, start + DEFAULT_BATCH_SIZE)
+            for pos in range(72, len(raw), HEADER_SIZE):
+                validator.chainwork += validator._block_work(raw[pos:pos + 4])
+        return validator
+
+    def _block_work(self, bits):
+        work = self._work.get(bits)
+        if work is None:
+            work = self._work[bits] = block_work(bits)
+        return work
+
+    def _expected_bits(self, height):
+        if self.bits is None or not self.retarget or height % RETARGET_INTERVAL:
+            return self.bits
+        return calculate_new_bits(self.bits, self._last_timestamp - self._period_start_timestamp)
+
+    def validate_buffer(self, buf, store=None):
+        #Validates back to back raw headers, returns the number accepted
+        # raises ValueError at the first bad header; everything before it is
+        # accepted (and appended to store, if given)
+        buf = memoryview(buf).cast('B')
+        if len(buf) % HEADER_SIZE:
+            raise ValueError('buffer is not a whole number of headers')
+        hashes = []
+        passed = check_pow_batch(buf, hashes)
+        accepted = 0
+        try:
+            for i, pos in enumerate(range(0, len(buf), HEADER_SIZE)):
+                raw = buf[pos:pos + HEADER_SIZE]
+                height = self.height + 1
+                if self.tip_hash is not None and raw[4:36] != self.tip_hash:
+                    raise ValueError('header {} does not build on the previous header'.format(height))
+                bits = bytes(raw[72:76])
+                expected = self._expected_bits(height)
+                if expected is not None and bits != expected:
+                    raise ValueError('header {} has bits {}, expected {}'.format(height, bits.hex(), expected.hex()))
+                if not passed[i]:
+                    raise ValueError('header {} fails proof of work'.format(height))
+                timestamp = _unpack_timestamp(raw, 68)[0]
+                if height % RETARGET_INTERVAL == 0:
+                    self._period_start_timestamp = timestamp
+                self._last_timestamp = timestamp
+                self.height = height
+                self.tip_hash = hashes[i]
+                self.bits = bits
+                self.chainwork += self._block_work(bits)
+                accepted += 1
+        finally:
+            if store is not None and accepted:
+                store.extend(buf[:accepted * HEADER_SIZE])
+        return accepted
+
+    def validate(self, headers, batch_size=DEFAULT_BATCH_SIZE, store=None):
+        #Validates headers from a binary file, a buffer or an iterable of Blocks / raw headers
+        # returns the chainwork of the validated chain, raises ValueError at the first bad header
+        if hasattr(headers, 'read'):
+            while True:
+                buf = headers.read(batch_size * HEADER_SIZE)
+                if not buf:
+                    break
+                self.validate_buffer(buf, store)
+        elif isinstance(headers, (bytes, bytearray, memoryview)):
+            self.validate_buffer(headers, store)
+        else:
+            batch = []
+            for header in headers:
+                batch.append(header.serialize() if isinstance(header, Block) else header)
+                if len(batch) == batch_size:
+                    self.validate_buffer(b''.join(batch), store)
+                    batch = []
+            if batch:
+                self.validate_buffer(b''.join(batch), store)
+        return self.chainwork
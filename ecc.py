@@ -1,12 +1,14 @@
 from random import randint
 import hashlib
 import hmac
-from helper import encode_base58_checksum, hash160
+from helper import encode_base58_checksum, hash160, LRUCache
 
 
 
 
 class FiniteFieldElement:
+    # no per-instance __dict__, there can be a lot of these around
+    __slots__ = ('num', 'prime')
 
     def __init__(self, num, prime):
         if num >= prime or num < 0:  
@@ -153,11 +155,408 @@ A = 0
 B = 7
 N = 0xfffffffffffffffffffffffffffffffebaaedce6af48a03bbfd25e8cd0364141
 
+
+#####   JACOBIAN COORDINATES
+# a point (x, y) is kept as (X, Y, Z) with x = X/Z^2 and y = Y/Z^3
+# so adding and doubling never need a modular inversion.
+# everything here works on plain ints mod P, the curve has a = 0.
+# only one inversion is paid at the very end when converting back to affine.
+# the point at infinity is any triple with Z = 0
+
+_JACOBIAN_INFINITY = (1, 1, 0)
+
+
+def _jacobian_double(p):
+    x1, y1, z1 = p
+    if z1 == 0 or y1 == 0:
+        return _JACOBIAN_INFINITY
+    a = x1 * x1 % P
+    b = y1 * y1 % P
+    c = b * b % P
+    d = 2 * ((x1 + b) * (x1 + b) - a - c) % P
+    e = 3 * a % P
+    x3 = (e * e - 2 * d) % P
+    y3 = (e * (d - x3) - 8 * c) % P
+    z3 = 2 * y1 * z1 % P
+    return (x3, y3, z3)
+
+
+def _jacobian_add(p, q):
+    x1, y1, z1 = p
+    x2, y2, z2 = q
+    if z1 == 0:
+        return q
+    if z2 == 0:
+        return p
+    z1z1 = z1 * z1 % P
+    z2z2 = z2 * z2 % P
+    u1 = x1 * z2z2 % P
+    u2 = x2 * z1z1 % P
+    s1 = y1 * z2 * z2z2 % P
+    s2 = y2 * z1 * z1z1 % P
+    h = (u2 - u1) % P
+    r = (s2 - s1) % P
+    if h == 0:
+        if r == 0:
+            # same point, the addition formula breaks down
+            return _jacobian_double(p)
+        # p + (-p)
+        return _JACOBIAN_INFINITY
+    h2 = h * h % P
+    h3 = h * h2 % P
+    u1h2 = u1 * h2 % P
+    x3 = (r * r - h3 - 2 * u1h2) % P
+    y3 = (r * (u1h2 - x3) - s1 * h3) % P
+    z3 = h * z1 * z2 % P
+    return (x3, y3, z3)
+
+
+def _jacobian_add_affine(p, q):
+    # mixed addition, q is an affine (x, y) pair so Z2 = 1
+    x1, y1, z1 = p
+    x2, y2 = q
+    if z1 == 0:
+        return (x2, y2, 1)
+    z1z1 = z1 * z1 % P
+    u2 = x2 * z1z1 % P
+    s2 = y2 * z1 * z1z1 % P
+    h = (u2 - x1) % P
+    r = (s2 - y1) % P
+    if h == 0:
+        if r == 0:
+            return _jacobian_double(p)
+        return _JACOBIAN_INFINITY
+    h2 = h * h % P
+    h3 = h * h2 % P
+    u1h2 = x1 * h2 % P
+    x3 = (r * r - h3 - 2 * u1h2) % P
+    y3 = (r * (u1h2 - x3) - y1 * h3) % P
+    z3 = h * z1 % P
+    return (x3, y3, z3)
+
+
+def _jacobian_multiply(p, coefficient):
+    # left to right double-and-add
+    result = _JACOBIAN_INFINITY
+    for bit in bin(coefficient)[2:]:
+        result = _jacobian_double(result)
+        if bit == '1':
+            result = _jacobian_add(result, p)
+    return result
+
+
+def _to_jacobian(point):
+    if point.x is None:
+        return _JACOBIAN_INFINITY
+    return (point.x.num, point.y.num, 1)
+
+
+def _from_jacobian(p):
+    x, y, z = p
+    if z == 0:
+        return S256Point(None, None)
+    z_inv = pow(z, P - 2, P)
+    z_inv2 = z_inv * z_inv % P
+    return S256Point._unchecked(x * z_inv2 % P, y * z_inv2 * z_inv % P)
+
+
+def _affine_x(p):
+    # just the affine x coordinate, for when the point itself isn't needed
+    return p[0] * pow(p[2] * p[2], P - 2, P) % P
+
+
+#####   BATCH INVERSION
+# montgomery's trick: to invert a1..an multiply them all together, invert the
+# product once, then peel the individual inverses off going backwards.
+# n inversions become 1 inversion + ~3n multiplications.
+
+def batch_inverse(values, modulus=P):
+    # inverses of all values mod modulus (P for coordinates, N for scalars)
+    # a value of 0 has no inverse, it gets 0 back and doesn't spoil the rest
+    prefix = []
+    acc = 1
+    for v in values:
+        prefix.append(acc)
+        if v % modulus:
+            acc = acc * v % modulus
+    acc_inv = pow(acc, modulus - 2, modulus)
+    result = [0] * len(prefix)
+    for i in range(len(prefix) - 1, -1, -1):
+        v = values[i] % modulus
+        if v:
+            result[i] = acc_inv * prefix[i] % modulus
+            acc_inv = acc_inv * v % modulus
+    return result
+
+
+def _normalize_affine(points):
+    # jacobian triples -> affine (x, y) int pairs, None for infinity
+    z_invs = batch_inverse([p[2] for p in points], P)
+    result = []
+    for (x, y, z), z_inv in zip(points, z_invs):
+        if z == 0:
+            result.append(None)
+            continue
+        z_inv2 = z_inv * z_inv % P
+        result.append((x * z_inv2 % P, y * z_inv2 * z_inv % P))
+    return result
+
+
+def normalize_points(points):
+    # converts many jacobian (X, Y, Z) triples to S256Points with one inversion
+    result = []
+    for affine in _normalize_affine(points):
+        if affine is None:
+            result.append(S256Point(None, None))
+        else:
+            result.append(S256Point._unchecked(*affine))
+    return result
+
+
+#####   FIXED BASE TABLE
+# a point that gets multiplied over and over (like G) can have its
+# multiples precomputed once. the scalar is cut into windows of w bits,
+# for window i the table keeps d * 2^(w*i) * point for every digit d,
+# so k * point is just one table lookup + addition per window, no doublings.
+# bigger windows mean fewer additions but 2^w times more memory:
+#   w = 4 ->   64 windows x  15 points
+#   w = 8 ->   32 windows x 255 points
+
+class _FixedBaseTable:
+
+    def __init__(self, point, window):
+        self.window = window
+        self.mask = (1 << window) - 1
+        num_windows = (256 + window - 1) // window
+        rows = []
+        base = point
+        for _ in range(num_windows):
+            row = [base]
+            for _ in range(self.mask - 1):
+                row.append(_jacobian_add(row[-1], base))
+            rows.append(row)
+            # next window base is 2^w times this one
+            for _ in range(window):
+                base = _jacobian_double(base)
+        # store everything affine so lookups can use the cheaper mixed addition
+        affine = _normalize_affine([p for row in rows for p in row])
+        self.rows = [affine[i * self.mask:(i + 1) * self.mask] for i in range(num_windows)]
+
+    def multiply(self, coefficient):
+        # returns coefficient * point in jacobian coordinates
+        result = _JACOBIAN_INFINITY
+        window, mask = self.window, self.mask
+        for row in self.rows:
+            digit = coefficient & mask
+            if digit:
+                result = _jacobian_add_affine(result, row[digit - 1])
+            coefficient >>= window
+            if not coefficient:
+                break
+        return result
+
+
+# window size of the precomputed table for G, 0 or None turns it off
+GENERATOR_TABLE_WINDOW = 4
+
+_generator_table = None
+
+
+def set_generator_table_window(window):
+    # change the table size for G, the table is rebuilt on next use
+    global GENERATOR_TABLE_WINDOW, _generator_table
+    GENERATOR_TABLE_WINDOW = window
+    _generator_table = None
+
+
+def _generator_multiply(coefficient):
+    # coefficient * G in jacobian coordinates using the lazily built table
+    global _generator_table
+    coefficient %= N
+    if not GENERATOR_TABLE_WINDOW:
+        return _jacobian_multiply(_to_jacobian(G), coefficient)
+    if _generator_table is None or _generator_table.window != GENERATOR_TABLE_WINDOW:
+        _generator_table = _FixedBaseTable(_to_jacobian(G), GENERATOR_TABLE_WINDOW)
+    return _generator_table.multiply(coefficient)
+
+
+#####   JOINT MULTIPLICATION (STRAUS / SHAMIR'S TRICK)
+# u*A + v*B done as two separate multiplications pays for ~256 doublings twice.
+# instead every scalar is written in wNAF form (signed odd digits, mostly zeros)
+# and all of them walk down a single shared doubling chain, adding the
+# precomputed odd multiple of their point whenever their digit is non zero.
+
+# window for variable points, and the (bigger, built once) window for G
+MULTI_MULTIPLY_WINDOW = 5
+_GENERATOR_WNAF_WINDOW = 8
+
+_generator_odd_multiples = None
+
+
+#####   GLV ENDOMORPHISM
+# secp256k1 has a cheap endomorphism: (x, y) -> (BETA*x, y) is the same as
+# multiplying the point by LAMBDA. so a scalar k can be split into
+# k = k1 + k2*LAMBDA (mod N) with k1, k2 around 128 bits each, and
+# k*P = k1*P + k2*endo(P) needs only half as many doublings.
+# the constants and the decomposition basis are the standard ones
+# from "Faster Point Multiplication on Elliptic Curves" (Gallant, Lambert, Vanstone)
+
+USE_GLV = True
+
+GLV_BETA = 0x7ae96a2b657c07106e64479eac3434e99cf0497512f58995c1396c28719501ee
+GLV_LAMBDA = 0x5363ad4cc05c30e0a5261c028812645a122e22ea20816678df02967c1b23bd72
+
+_GLV_A1 = 0x3086d221a7d46bcde86c90e49284eb15
+_GLV_B1 = -0xe4437ed6010e88286f547fa90abfe4c3
+_GLV_A2 = 0x114ca50f7a8e2f3f657c1108d9d44cfd8
+_GLV_B2 = 0x3086d221a7d46bcde86c90e49284eb15
+
+
+def glv_decompose(k):
+    # returns (k1, k2), possibly negative, with k1 + k2*GLV_LAMBDA == k mod N
+    k %= N
+    c1 = (_GLV_B2 * k + N // 2) // N
+    c2 = (-_GLV_B1 * k + N // 2) // N
+    k1 = k - c1 * _GLV_A1 - c2 * _GLV_A2
+    k2 = -c1 * _GLV_B1 - c2 * _GLV_B2
+    return k1, k2
+
+
+def _endomorphism_table(table):
+    # the same odd multiples, mapped through (x, y) -> (BETA*x, y)
+    return [(GLV_BETA * x % P, y) for x, y in table]
+
+
+def _wnaf(k, window):
+    # digits are least significant first, each is 0 or odd with |d| < 2^(w-1)
+    digits = []
+    full = 1 << window
+    half = 1 << (window - 1)
+    while k:
+        if k & 1:
+            d = k & (full - 1)
+            if d >= half:
+                d -= full
+            k -= d
+        else:
+            d = 0
+        digits.append(d)
+        k >>= 1
+    return digits
+
+
+def _odd_multiples(p, window):
+    # affine [1p, 3p, 5p, ... (2^(w-1)-1)p]
+    twice = _jacobian_double(p)
+    multiples = [p]
+    for _ in range((1 << (window - 2)) - 1):
+        multiples.append(_jacobian_add(multiples[-1], twice))
+    return _normalize_affine(multiples)
+
+
+def _multi_multiply_jacobian(pairs, table_cache=None):
+    # pairs are (scalar, jacobian point or None for G), result in jacobian
+    # table_cache (a dict) lets repeated points reuse their odd multiples
+    global _generator_odd_multiples
+    terms = []
+    for coefficient, point in pairs:
+        coefficient %= N
+        if coefficient == 0:
+            continue
+        if point is None:
+            if _generator_odd_multiples is None:
+                table = _odd_multiples(_to_jacobian(G), _GENERATOR_WNAF_WINDOW)
+                _generator_odd_multiples = (table, _endomorphism_table(table))
+            window, tables = _GENERATOR_WNAF_WINDOW, _generator_odd_multiples
+        else:
+            if point[2] == 0:
+                continue
+            tables = None if table_cache is None else table_cache.get(point)
+            if tables is None:
+                table = _odd_multiples(point, MULTI_MULTIPLY_WINDOW)
+                tables = (table, _endomorphism_table(table))
+                if table_cache is not None:
+                    table_cache[point] = tables
+            window = MULTI_MULTIPLY_WINDOW
+        if USE_GLV:
+            # k*P = k1*P + k2*endo(P) with both halves ~128 bits
+            for k, table in zip(glv_decompose(coefficient), tables):
+                if k == 0:
+                    continue
+                digits = _wnaf(abs(k), window)
+                if k < 0:
+                    digits = [-d for d in digits]
+                terms.append((digits, table))
+        else:
+            terms.append((_wnaf(coefficient, window), tables[0]))
+    result = _JACOBIAN_INFINITY
+    if not terms:
+        return result
+    for i in range(max(len(digits) for digits, _ in terms) - 1, -1, -1):
+        result = _jacobian_double(result)
+        for digits, table in terms:
+            if i >= len(digits):
+                continue
+            d = digits[i]
+            if d > 0:
+                result = _jacobian_add_affine(result, table[d >> 1])
+            elif d < 0:
+                x, y = table[(-d) >> 1]
+                result = _jacobian_add_affine(result, (x, P - y))
+    return result
+
+
+def multi_multiply(pairs):
+    # computes the sum of scalar * point for every (scalar, point) in pairs
+    # with a single shared doubling chain, e.g. multi_multiply([(u, G), (v, point)])
+    jacobian_pairs = []
+    for coefficient, point in pairs:
+        if point._is_generator():
+            jacobian_pairs.append((coefficient, None))
+        else:
+            jacobian_pairs.append((coefficient, _to_jacobian(point)))
+    return _from_jacobian(_multi_multiply_jacobian(jacobian_pairs))
+
+
+def public_keys(secrets, batch_size=256):
+    # streams secret * G for many secrets, in order
+    # a secret that is one more than the previous one costs a single mixed
+    # addition of G instead of a table multiplication, and every batch of
+    # batch_size points is turned affine with one shared inversion
+    g = (G.x.num, G.y.num)
+    batch = []
+    current = None
+    previous = None
+    for secret in secrets:
+        if secret % N == 0:
+            raise ValueError('secret {} gives the point at infinity'.format(secret))
+        if previous is not None and secret == previous + 1:
+            current = _jacobian_add_affine(current, g)
+        else:
+            current = _generator_multiply(secret)
+        previous = secret
+        batch.append(current)
+        if len(batch) >= batch_size:
+            yield from normalize_points(batch)
+            batch = []
+    if batch:
+        yield from normalize_points(batch)
+
 # defining a field for bitcoin
 class S256Field(FiniteFieldElement):
+    __slots__ = ()
+
     def __init__(self, num, prime=None):
         super().__init__(num = num, prime = P)
 
+    @classmethod
+    def _unchecked(cls, num):
+        # internal fast constructor, num must already be reduced mod P
+        element = cls.__new__(cls)
+        element.num = num
+        element.prime = P
+        return element
+
     def __repr__(self):
         return '{:x}'.format(self.num).zfill(64)
     
@@ -168,13 +567,55 @@ class S256Field(FiniteFieldElement):
 
 
 
+# the curve constants are shared by every S256Point instead of rebuilt each time
+_S256_A = S256Field(A)
+_S256_B = S256Field(B)
+
+# parsed public keys keyed by their SEC bytes. decompressing a key costs a
+# full 256 bit exponentiation (the sqrt) and the same few keys keep coming
+# back in scripts, so they are kept around. SEC_PARSE_CACHE.resize(n) changes
+# the size (0 disables it), .hits / .misses tell how well it is doing
+SEC_PARSE_CACHE = LRUCache(maxsize=4096)
+
+# fixed base tables for keys registered with S256Point.precompute(), by SEC
+_PRECOMPUTED_POINTS = {}
+
+
+def clear_precomputed():
+    # forgets every per key table built by S256Point.precompute()
+    _PRECOMPUTED_POINTS.clear()
+
+
 class S256Point(Point):
     def __init__(self, x, y, a= None, b= None):
-        a, b = S256Field(A), S256Field(B)
         if type(x) == int:
-            super().__init__(x = S256Field(x), y=S256Field(y), a=a, b=b)
-        else:
-            super().__init__(x=x, y=y, a=a, b=b)
+            x, y = S256Field(x), S256Field(y)
+        self.a = _S256_A
+        self.b = _S256_B
+        self.x = x
+        self.y = y
+        self._sec_cache = {}
+        if x is None and y is None:
+            return
+        # same check as Point.__init__ but on plain ints
+        if (y.num * y.num - x.num * x.num * x.num - B) % P != 0:
+            raise ValueError('({}, {}) is not on the curve'.format(x, y))
+
+    @classmethod
+    def _unchecked(cls, x, y):
+        # internal constructor for points computed by this module,
+        # they are on the curve by construction so the check is skipped.
+        # anything coming from outside (parse, S256Point(x, y)) is still checked
+        point = cls.__new__(cls)
+        point.a = _S256_A
+        point.b = _S256_B
+        point.x = S256Field._unchecked(x)
+        point.y = S256Field._unchecked(y)
+        point._sec_cache = {}
+        return point
+
+    def _is_generator(self):
+        return self is G or (self.x is not None and self.x.num == G.x.num and self.y.num == G.y.num)
 
     def __repr__(self):
         if self.x is None:
@@ -185,15 +626,47 @@ class S256Point(Point):
 
     def __rmul__(self,coefficient):
         coef = coefficient % N
-        return super().__rmul__(coef)
-    
+        if self._is_generator():
+            return _from_jacobian(_generator_multiply(coef))
+        # work in jacobian coordinates, one inversion at the end
+        if USE_GLV:
+            return _from_jacobian(_multi_multiply_jacobian([(coef, _to_jacobian(self))]))
+        return _from_jacobian(_jacobian_multiply(_to_jacobian(self), coef))
+
     def verify(self, z, sig):
         s_inv = pow(sig.s, N-2, N) # using fermat's little theorem
-        u = z * s_inv % N 
+        u = z * s_inv % N
         v = sig.r * s_inv % N
-        total = u * G + v * self
-        return total.x.num == sig.r
+        x, _, z3 = self._verify_sum(u, v)
+        if z3 == 0:
+            return False
+        # x / Z^2 == r  <=>  X == r * Z^2, so no inversion is needed
+        return x == sig.r * z3 * z3 % P
     
+    def _verify_sum(self, u, v, table_cache=None):
+        # u*G + v*self in jacobian coordinates
+        table = _PRECOMPUTED_POINTS.get(self.sec()) if self.x is not None else None
+        if table is not None:
+            # both sides have fixed base tables, no doublings at all
+            return _jacobian_add(_generator_multiply(u), table.multiply(v % N))
+        # otherwise u*G + v*self on one doubling chain
+        return _multi_multiply_jacobian([(u, None), (v, _to_jacobian(self))], table_cache)
+
+    def precompute(self, window=4):
+        # builds a fixed base table for this point (like the one for G) and
+        # registers it by SEC, so every later verify against this key, from
+        # any S256Point object equal to it, skips the doublings.
+        # meant for the handful of keys that get verified against constantly,
+        # the table costs about 2^window * 256/window points of memory
+        if self.x is None:
+            raise ValueError('cannot precompute the point at infinity')
+        _PRECOMPUTED_POINTS[self.sec()] = _FixedBaseTable(_to_jacobian(self), window)
+        return self
+
+    def discard_precomputed(self):
+        # drops this point's table from the registry, if it had one
+        _PRECOMPUTED_POINTS.pop(self.sec(), None)
+
     def sec(self, compressed =True):
         # returns the binary version of the SEC format
         # advantage of compression is we need only 33 bytes instead of 65 bytes
@@ -232,15 +705,37 @@ class S256Point(Point):
     # w^2 = v
 # w = v^((p+1)/4)
 
+        # points don't change, so the encoding is worked out once per point
+        cached = self._sec_cache.get(compressed)
+        if cached is not None:
+            return cached
         if compressed:
             if self.y.num % 2 == 0:
-                return b'\x02' + self.x.num.to_bytes(32, 'big')
+                result = b'\x02' + self.x.num.to_bytes(32, 'big')
             else:
-                return b'\03' + self.x.num.to_byted(32,'big')
+                result = b'\x03' + self.x.num.to_bytes(32,'big')
         else:
-            return b'\04' + self.x.num.to_bytes(32, 'big') + self.y.num.to_bytes(32,'big')
-        
-    def parse(self, sec_bin):
+            result = b'\04' + self.x.num.to_bytes(32, 'big') + self.y.num.to_bytes(32,'big')
+        self._sec_cache[compressed] = result
+        return result
+
+    @classmethod
+    def parse(cls, sec_bin):
+        # returns a Point object from a SEC binary (not hex), through SEC_PARSE_CACHE
+        sec_bin = bytes(sec_bin)
+        point = SEC_PARSE_CACHE.get(sec_bin)
+        if point is None:
+            point = cls._parse_uncached(sec_bin)
+            # the bytes we were given are this point's sec() already
+            point._sec_cache[sec_bin[0] != 4] = sec_bin
+            SEC_PARSE_CACHE.put(sec_bin, point)
+        return point
+
+    @classmethod
+    def _parse_uncached(cls, sec_bin):
+        # only exact encodings, parse() keeps the bytes as the point's sec()
+        if not ((len(sec_bin) == 65 and sec_bin[0] == 4) or (len(sec_bin) == 33 and sec_bin[0] in (2, 3))):
+            raise ValueError('not a SEC public key: {}'.format(sec_bin.hex()))
         if sec_bin[0] == 4: 
             x = int.from_bytes(sec_bin[1:33], 'big')
             y = int.from_bytes(sec_bin[33:65], 'big')
@@ -265,7 +760,11 @@ class S256Point(Point):
             return S256Point(x, odd_beta)
         
     def hash160(self, compressed=True):
-        return hash160(self.sec(compressed))
+        key = ('hash160', compressed)
+        cached = self._sec_cache.get(key)
+        if cached is None:
+            cached = self._sec_cache[key] = hash160(self.sec(compressed))
+        return cached
     
     def address(self, compressed=True, testnet=False):
         # Returns the address string
@@ -340,7 +839,27 @@ class Signature:
     
     def __repr__(self):
         return 'Signature({:x},{:x})'.format(self.r, self.s)
-    
+
+    @classmethod
+    def parse(cls, signature_bin):
+        # reads a DER signature back into r and s (the reverse of der())
+        if len(signature_bin) < 8 or signature_bin[0] != 0x30:
+            raise SyntaxError('Bad Signature')
+        if signature_bin[1] + 2 != len(signature_bin):
+            raise SyntaxError('Bad Signature Length')
+        if signature_bin[2] != 0x02:
+            raise SyntaxError('Bad Signature')
+        rlength = signature_bin[3]
+        r = int.from_bytes(signature_bin[4:4 + rlength], 'big')
+        marker = 4 + rlength
+        if marker + 2 > len(signature_bin) or signature_bin[marker] != 0x02:
+            raise SyntaxError('Bad Signature')
+        slength = signature_bin[marker + 1]
+        s = int.from_bytes(signature_bin[marker + 2:marker + 2 + slength], 'big')
+        if len(signature_bin) != 6 + rlength + slength:
+            raise SyntaxError('Signature too long')
+        return cls(r, s)
+
     def der(self):
 
         # DER signature format is defined like this:
@@ -376,12 +895,44 @@ class Signature:
         result += bytes([2, len(sbin)]) + sbin
         return bytes([0x30, len(result)]) + result
 
-    
+
+# verify many (point, z, sig) items at once
+# all the s inverses come out of a single pow() (montgomery's trick),
+# each check is one joint u*G + v*P multiplication compared in jacobian
+# form (no inversion), and a point that shows up several times in the batch
+# only gets its odd multiples table built once.
+# returns one True/False per item, in order. with stop_on_failure=True it
+# stops at the first bad signature and the items after it are left as None
+def verify_batch(items, stop_on_failure=False):
+    items = list(items)
+    results = [None] * len(items)
+    # signatures with r or s out of range are invalid and can't be inverted
+    checkable = []
+    for i, (point, z, sig) in enumerate(items):
+        if 0 < sig.r < N and 0 < sig.s < N and point.x is not None:
+            checkable.append(i)
+    s_invs = dict(zip(checkable, batch_inverse([items[i][2].s for i in checkable], N)))
+    table_cache = {}
+    for i, (point, z, sig) in enumerate(items):
+        if i not in s_invs:
+            ok = False
+        else:
+            s_inv = s_invs[i]
+            u = z * s_inv % N
+            v = sig.r * s_inv % N
+            x, _, z3 = point._verify_sum(u, v, table_cache)
+            ok = z3 != 0 and x == sig.r * z3 * z3 % P
+        results[i] = ok
+        if not ok and stop_on_failure:
+            break
+    return results
+
+
 # Message signing
 class PrivateKey:
     def __init__(self, secret):
         self.secret = secret
-        self.point = secret * G # public key
+        self.point = _from_jacobian(_generator_multiply(secret)) # public key
     
     def hex(self):
         return '{:x}'.format(self.secret).zfill(64) 
@@ -389,7 +940,7 @@ class PrivateKey:
     def sign(self, z):
 
         k = randint(0,N) # choose random integer (0,n)
-        r = (k*G).x.num  # r's x coordinate
+        r = _affine_x(_generator_multiply(k))  # r's x coordinate
         k_inv = pow(k,N-2,N)  # find inverse using fermat's little theorem
         s = (z + r*self.secret) * k_inv % N
         if s > N/2:
@@ -0,0 +1,153 @@
+import mmap
+import os
+import threading
+from io import BytesIO
+
+from block import Block, HEADER_SIZE
+from helper import hash256
+
+
+# the header chain kept as serialized 80 byte headers back to back in a flat
+# file, mmap'ed for reads. the header at height h lives at offset h * 80, so
+# height -> offset needs no index at all. hash -> height is a dict keyed on the
+# first 8 bytes of the header hash as an int (the full hash is compared on
+# lookup, so a shared prefix can't return the wrong header).
+# Block objects are only built when a header is asked for.
+
+
+def _short_key(h256):
+    return int.from_bytes(h256[:8], 'little')
+
+
+class HeaderStore:
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a+b')
+        size = os.fstat(self._file.fileno()).st_size
+        if size % HEADER_SIZE:
+            # half written header from a crash
+            size -= size % HEADER_SIZE
+            self._file.truncate(size)
+        self._count = size // HEADER_SIZE
+        self._map = None
+        self._mapped = 0
+        self._index = {}
+        # hashes whose 8 byte prefix is already taken, by full hash
+        self._collisions = {}
+        self._remap()
+        for height in range(self._count):
+            self._index_header(height, self._map[height * HEADER_SIZE:(height + 1) * HEADER_SIZE])
+
+    def __repr__(self):
+        return 'HeaderStore({!r}, headers={})'.format(self.path, self._count)
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, block_hash):
+        return self.height_of(block_hash) is not None
+
+    def __getitem__(self, height):
+        return self.get(height)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.close()
+
+    def _remap(self):
+        # maps whatever has been written so far; an empty file can't be mapped
+        if self._mapped == self._count:
+            return
+        self._file.flush()
+        if self._map is not None:
+            self._map.close()
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mapped = self._count
+
+    def _index_header(self, height, raw):
+        h256 = hash256(raw)
+        key = _short_key(h256)
+        if key in self._index:
+            self._collisions[h256] = height
+        else:
+            self._index[key] = height
+
+    def _check_height(self, height):
+        if height < 0:
+            height += self._count
+        if not 0 <= height < self._count:
+            raise IndexError('no header at height {}'.format(height))
+        return height
+
+    def append(self, header):
+        #Adds a header (Block or 80 raw bytes) on top, returns its height
+        raw = header.serialize() if isinstance(header, Block) else bytes(header)
+        if len(raw) != HEADER_SIZE:
+            raise ValueError('a header is {} bytes, got {}'.format(HEADER_SIZE, len(raw)))
+        with self._lock:
+            self._file.write(raw)
+            height = self._count
+            self._count += 1
+            self._index_header(height, raw)
+            return height
+
+    def extend(self, headers):
+        #Appends a buffer of back to back raw headers, returns the new height count
+        headers = memoryview(headers).cast('B')
+        if len(headers) % HEADER_SIZE:
+            raise ValueError('buffer is not a whole number of headers')
+        with self._lock:
+            self._file.write(headers)
+            for pos in range(0, len(headers), HEADER_SIZE):
+                self._index_header(self._count, headers[pos:pos + HEADER_SIZE])
+                self._count += 1
+            return self._count
+
+    def raw(self, height):
+        #The 80 serialized bytes of the header at height
+        with self._lock:
+            height = self._check_height(height)
+            self._remap()
+            offset = height * HEADER_SIZE
+            return self._map[offset:offset + HEADER_SIZE]
+
+    def raw_range(self, start, stop):
+        #Serialized headers start..stop-1 as one contiguous bytes object
+        with self._lock:
+            start, stop, _ = slice(start, stop).indices(self._count)
+            self._remap()
+            return self._map[start * HEADER_SIZE:max(start, stop) * HEADER_SIZE]
+
+    def get(self, height):
+        #The Block (header only) at height
+        return Block.parse(BytesIO(self.raw(height)))
+
+    def tip(self):
+        #The highest header, None when the store is empty
+        return self.get(-1) if self._count else None
+
+    def height_of(self, block_hash):
+        #Height of the header with block_hash (as returned by Block.hash()), None if unknown
+        h256 = block_hash[::-1]
+        height = self._index.get(_short_key(h256))
+        if height is None:
+            return None
+        if hash256(self.raw(height)) == h256:
+            return height
+        return self._collisions.get(h256)
+
+    def get_by_hash(self, block_hash):
+        #The Block with block_hash, None if unknown
+        height = self.height_of(block_hash)
+        return None if height is None else self.get(height)
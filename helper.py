@@ -1,4 +1,8 @@
 import hashlib
+import threading
+from itertools import count
+from struct import unpack_from
+from collections import OrderedDict
 
 
 SIGHASH_ALL = 1
@@ -80,6 +84,20 @@ def read_varint(s):
         return i
 
 
+def read_varint_from(buf, offset):
+    #read_varint for a buffer (bytes/memoryview) and offset instead of a stream
+    #returns the integer and the offset just after it
+    i = buf[offset]
+    if i == 0xfd:
+        return unpack_from('<H', buf, offset + 1)[0], offset + 3
+    elif i == 0xfe:
+        return unpack_from('<I', buf, offset + 1)[0], offset + 5
+    elif i == 0xff:
+        return unpack_from('<Q', buf, offset + 1)[0], offset + 9
+    else:
+        return i, offset + 1
+
+
 def encode_varint(i):
     #encodes an integer as a varint
     if i < 0xfd:
@@ -137,3 +155,127 @@ def calculate_new_bits(previous_bits, time_differential):
         new_target = MAX_TARGET
     # convert the new target to bits
     return target_to_bits(new_target)
+
+
+#small bounded cache shared by the modules that memoize expensive results
+class LRUCache:
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'LRUCache(size={}, maxsize={}, hits={}, misses={})'.format(
+            len(self._data), self.maxsize, self.hits, self.misses)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def get(self, key, default=None):
+        #returns the cached value (and marks it recently used) or default
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        #stores the value, evicting the least recently used entries if full
+        with self._lock:
+            if self.maxsize <= 0:
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def keys(self):
+        #snapshot of the keys, least recently used first
+        with self._lock:
+            return list(self._data.keys())
+
+    def resize(self, maxsize):
+        #changes the capacity, dropping the oldest entries if it shrank
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._data) > max(maxsize, 0):
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+#edit tracking behind the serialization caches of Script, TxIn, TxOut and Tx
+# every edit takes a new stamp from edit_stamp(), the edited object keeps it
+# and EDITS.now moves to it. a cache that remembers EDITS.now when it's filled
+# knows in O(1) that nothing at all was edited since; only after some edit
+# (to any transaction) does it have to compare the stamps of its own parts.
+# SIGHASH_EDITS does the same for the sighash contexts, it moves on every edit
+# except assigning a TxIn's script_sig, which signature hashes don't depend on.
+_edit_stamps = count(1)
+
+
+class EditClock:
+
+    __slots__ = ('now',)
+
+    def __init__(self):
+        self.now = 0
+
+
+EDITS = EditClock()
+SIGHASH_EDITS = EditClock()
+
+
+def edit_stamp(sighash=True):
+    #new stamp for an object that was just edited
+    stamp = next(_edit_stamps)
+    EDITS.now = stamp
+    if sighash:
+        SIGHASH_EDITS.now = stamp
+    return stamp
+
+
+class StampedList(list):
+    # a list that takes a new edit_stamp() whenever it's modified in place,
+    # until then it has the class default
+
+    stamp = 0
+
+    def __reduce__(self):
+        # stamps only mean something inside one process, an unpickled copy starts over
+        return StampedList, (list(self),)
+
+
+def _stamping(name):
+    method = getattr(list, name)
+
+    def edit(self, *args, **kwargs):
+        self.stamp = edit_stamp()
+        return method(self, *args, **kwargs)
+    edit.__name__ = name
+    return edit
+
+
+for _name in ('__setitem__', '__delitem__', '__iadd__', '__imul__', 'append', 'extend',
+              'insert', 'pop', 'remove', 'clear', 'sort', 'reverse'):
+    setattr(StampedList, _name, _stamping(_name))
+del _name
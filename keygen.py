@@ -0,0 +1,74 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from ecc import N, public_keys
+
+
+# bulk key generation
+# PrivateKey(secret) -> point.sec() -> hash160 -> base58 one key at a time
+# pays for a full scalar multiplication and an inversion per key. this goes
+# through ecc.public_keys instead, which walks consecutive secrets by adding
+# G and normalizes the points in batches, and streams
+#   (secret, sec, address)
+# tuples so millions of keys never have to sit in memory at once.
+
+# how many consecutive secrets one worker process handles per task
+DEFAULT_WORKER_CHUNK = 4096
+
+
+def derive_keys(secrets, compressed=True, testnet=False, batch_size=256):
+    #yields (secret, sec, address) for every secret, in order
+    # public_keys reads ahead up to a batch of secrets before it yields,
+    # the deque lines the secrets up again with their points
+    pending = deque()
+
+    def remember(secrets):
+        for secret in secrets:
+            pending.append(secret)
+            yield secret
+
+    for point in public_keys(remember(secrets), batch_size=batch_size):
+        yield pending.popleft(), point.sec(compressed), point.address(compressed, testnet)
+
+
+def _derive_chunk(args):
+    # runs inside a worker process
+    start, count, compressed, testnet = args
+    return list(derive_keys(range(start, start + count), compressed, testnet))
+
+
+def derive_range(start, count, compressed=True, testnet=False, workers=None,
+                 chunk_size=DEFAULT_WORKER_CHUNK):
+    #yields (secret, sec, address) for secrets start, start+1, ... start+count-1
+    # with workers > 1 the range is cut into chunks handed to worker processes,
+    # results still come out in order
+    # checked here and not in the generator, so a bad range fails right away
+    if start <= 0 or start + count - 1 >= N:
+        raise ValueError('secrets must be between 1 and N-1')
+    if not workers or workers <= 1:
+        return derive_keys(range(start, start + count), compressed, testnet)
+    return _derive_range_parallel(start, count, compressed, testnet, workers, chunk_size)
+
+
+def _derive_range_parallel(start, count, compressed, testnet, workers, chunk_size):
+    # only about two chunks per worker are in flight, the next one is submitted
+    # as one is yielded, so a slow consumer doesn't pile up finished results
+    tasks = (
+        (s, min(chunk_size, start + count - s), compressed, testnet)
+        for s in range(start, start + count, chunk_size)
+    )
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        in_flight = deque()
+        for task in tasks:
+            in_flight.append(executor.submit(_derive_chunk, task))
+            if len(in_flight) == workers * 2:
+                break
+        while in_flight:
+            chunk = in_flight.popleft().result()
+            task = next(tasks, None)
+            if task is not None:
+                in_flight.append(executor.submit(_derive_chunk, task))
+            yield from chunk
+    finally:
+        executor.shutdown(cancel_futures=True)
@@ -0,0 +1,66 @@
+from helper import hash256
+
+
+# merkle trees over transaction hashes
+# hashes go in and come out the way Tx.hash() and Block.merkle_root hold them
+# (reversed, as displayed); internally the tree is built over the serialized
+# little endian order.
+# a level of n hashes sits back to back in one bytearray. every parent is
+# written over the front of the same buffer (parent i only needs children
+# 2i and 2i+1, which were already read), the tail is then cut off and the
+# buffer is reused for the next level, so the whole root computation works
+# in the one buffer it started with.
+# an odd level gets its last hash repeated, as bitcoin does.
+
+
+def _leaves(hashes):
+    return bytearray(b''.join(h[::-1] for h in hashes))
+
+
+def _next_level(level):
+    # replaces level (a bytearray of 32 byte hashes) by its parent level in place
+    if len(level) % 64:
+        level += level[-32:]
+    with memoryview(level) as view:
+        for i in range(0, len(view), 64):
+            level[i // 2:i // 2 + 32] = hash256(view[i:i + 64])
+    del level[len(level) // 2:]
+
+
+def merkle_root(hashes):
+    #Merkle root of a list of tx hashes (Tx.hash() order), comparable to Block.merkle_root
+    if not hashes:
+        raise ValueError('a merkle tree needs at least one hash')
+    level = _leaves(hashes)
+    while len(level) > 32:
+        _next_level(level)
+    return bytes(level[::-1])
+
+
+def merkle_proof(hashes, index):
+    #Sibling hashes (Tx.hash() order) from leaf index up to the root
+    if not 0 <= index < len(hashes):
+        raise IndexError('leaf {} out of range'.format(index))
+    level = _leaves(hashes)
+    proof = []
+    while len(level) > 32:
+        sibling = index ^ 1
+        if sibling * 32 >= len(level):
+            # odd level, the last hash is paired with itself
+            sibling = index
+        proof.append(bytes(level[sibling * 32:sibling * 32 + 32][::-1]))
+        _next_level(level)
+        index //= 2
+    return proof
+
+
+def verify_merkle_proof(tx_hash, index, proof, root):
+    #Whether tx_hash is leaf index of the tree with this root, given merkle_proof's output
+    current = tx_hash[::-1]
+    for sibling in proof:
+        if index & 1:
+            current = hash256(sibling[::-1] + current)
+        else:
+            current = hash256(current + sibling[::-1])
+        index //= 2
+    return current[::-1] == root
@@ -0,0 +1,130 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from hashlib import sha256
+from struct import Struct
+
+from helper import int_to_little_endian
+
+
+# proof-of-work nonce search for regtest / test harness mining
+# the 80 byte header is version | prev_block | merkle_root | timestamp | bits | nonce.
+# sha256 works on 64 byte blocks and the first 64 bytes of the header don't
+# change while the nonce does, so their sha256 state (the midstate) is computed
+# once and copied for every attempt, which then only hashes the last 16 bytes.
+# the resulting hash is compared with the target as an integer.
+# the nonce space is cut into chunks that worker processes search, the first
+# hit cancels the rest. when all 2^32 nonces fail the timestamp is moved
+# forward a second and the search starts over.
+
+MAX_NONCE = 2 ** 32
+DEFAULT_CHUNK_SIZE = 2 ** 18
+
+_pack_nonce = Struct('<I').pack
+
+
+class MiningResult:
+
+    def __init__(self, block, hashes, elapsed):
+        self.block = block
+        self.hashes = hashes
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return 'MiningResult(found={}, hashes={}, {:.0f} H/s)'.format(
+            self.block is not None, self.hashes, self.hashrate)
+
+    @property
+    def hashrate(self):
+        #hashes per second
+        return self.hashes / self.elapsed if self.elapsed else 0.0
+
+
+def _search(header, start, end, target):
+    # tries nonces start..end-1 for the 76 byte header (everything but the nonce)
+    # returns (nonce or None, number of hashes tried)
+    midstate = sha256(header[:64])
+    tail = header[64:76]
+    for nonce in range(start, end):
+        h = midstate.copy()
+        h.update(tail + _pack_nonce(nonce))
+        if int.from_bytes(sha256(h.digest()).digest(), 'little') < target:
+            return nonce, nonce - start + 1
+    return None, end - start
+
+
+def _header_without_nonce(block):
+    return block.serialize()[:76]
+
+
+def mine(block, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, max_timestamp_rolls=16):
+    #Searches a nonce that satisfies block.target(), returns a MiningResult
+    # on success the block's nonce (and maybe timestamp) are updated and
+    # result.block is the block, otherwise result.block is None and the
+    # block is left with the timestamp it came with.
+    # workers=1 searches in this process, None uses one process per cpu
+    target = block.target()
+    start_time = time.perf_counter()
+    hashes = 0
+    workers = workers or os.cpu_count() or 1
+    executor = None if workers == 1 else ProcessPoolExecutor(max_workers=workers)
+    timestamp = block.timestamp
+    found = False
+    try:
+        for _ in range(max_timestamp_rolls + 1):
+            header = _header_without_nonce(block)
+            if executor is None:
+                nonce, tried = _search(header, 0, MAX_NONCE, target)
+                hashes += tried
+            else:
+                nonce, tried = _parallel_search(executor, workers, header, target, chunk_size)
+                hashes += tried
+            if nonce is not None:
+                found = True
+                block.nonce = int_to_little_endian(nonce, 4)
+                return MiningResult(block, hashes, time.perf_counter() - start_time)
+            # nonce space exhausted, roll the timestamp
+            block.timestamp += 1
+    finally:
+        if not found:
+            block.timestamp = timestamp
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return MiningResult(None, hashes, time.perf_counter() - start_time)
+
+
+def _parallel_search(executor, workers, header, target, chunk_size):
+    # keeps every worker busy with the next chunk until one finds a nonce
+    # returns (nonce or None, hashes tried)
+    chunks = iter(range(0, MAX_NONCE, chunk_size))
+    pending = {}
+    hashes = 0
+    found = None
+
+    def submit_next():
+        start = next(chunks, None)
+        if start is not None:
+            future = executor.submit(_search, header, start, min(start + chunk_size, MAX_NONCE), target)
+            pending[future] = start
+
+    for _ in range(workers * 2):
+        submit_next()
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            del pending[future]
+            nonce, tried = future.result()
+            hashes += tried
+            if nonce is not None and (found is None or nonce < found):
+                found = nonce
+        if found is None:
+            for _ in done:
+                submit_next()
+        else:
+            # chunks below the hit may still hold a lower nonce, let them finish
+            # so the result doesn't depend on scheduling; drop everything above
+            for future, start in list(pending.items()):
+                if start > found:
+                    future.cancel()
+                    del pending[future]
+    return found, hashes
@@ -4,6 +4,8 @@ from ecc import (
     Signature,
 )
 
+from sigcache import SIGNATURE_CACHE
+
 # OP_CHECKSEQUENCEVERIFY
 # OP_CHECKLOCKTIMEVERIFY, 
 
@@ -165,7 +167,7 @@ def op_verify(stack):
     if decode_number(ele) == 0:
         return False
     else:
-        True
+        return True
 
 def op_return(stack):
     return False
@@ -209,13 +211,19 @@ def op_checksig(stack, z):
     if len(stack)<2:
         return False
     pub_key = stack.pop()
+    # the last byte is the hash type
     signature = stack.pop()[:-1]
+    # already verified this exact signature (e.g. mempool then block)
+    if SIGNATURE_CACHE.contains(z, pub_key, signature):
+        stack.append(encode_number(1))
+        return True
     try:
         point = S256Point.parse(pub_key)
-        sig = signature.parse(signature)
+        sig = Signature.parse(signature)
     except (ValueError, SyntaxError) as e:
         return False
     if point.verify(z, sig):
+        SIGNATURE_CACHE.add(z, pub_key, signature)
         stack.append(encode_number(1))
     else:
         stack.append(encode_number(0))
@@ -440,7 +448,7 @@ OP_CODE_FUNCTIONS = {
 
 
 }
-OPCODE_NAMES = {
+OP_CODE_NAMES = {
    0: 'OP_0',
     76: 'OP_PUSHDATA1',
     77: 'OP_PUSHDATA2',
@@ -3,12 +3,16 @@ from io import BytesIO
 
 
 from helper import (
+    edit_stamp,
     encode_varint,
     int_to_little_endian,
     little_endian_to_int,
     read_varint,
+    read_varint_from,
+    StampedList,
 )
 from operation import (
+    decode_number,
     OP_CODE_FUNCTIONS,
     OP_CODE_NAMES,
 )
@@ -17,14 +21,28 @@ from operation import (
  #  creates a logger object specific to the module where this line of code is located. This logger can then be used throughout the module to 
 #log messages, warnings, errors, etc., providing a convenient way to manage and track the flow of information during program execution.
 #duplicates top element of the stack 
-class script:
+class Script:
 
     # command is either a an opcode or element to be pushed on to the stack
     def __init__(self, cmds=None):
+        # cmds is kept as a StampedList so in-place edits can be noticed
         if cmds is None:
-            self.cmds = []
-        else:
-            self.cmds = cmds
+            cmds = StampedList()
+        elif type(cmds) is not StampedList:
+            cmds = StampedList(cmds)
+        self.__dict__['cmds'] = cmds
+
+    def __setattr__(self, name, value):
+        if name == 'cmds':
+            value = StampedList(value)
+            value.stamp = edit_stamp()
+        self.__dict__[name] = value
+
+    @property
+    def stamp(self):
+        # changes whenever cmds is edited or replaced, caches of the
+        # serialization (TxIn, TxOut, Tx) compare it to spot stale bytes
+        return self.cmds.stamp
 
         #string representation of the object
     
@@ -72,6 +90,38 @@ class script:
         return cls(cmds)
     
     
+    @classmethod
+    def parse_buffer(cls, buf, offset=0):
+        # same as parse, but reads from a bytes/memoryview buffer at offset
+        # instead of a stream. returns the script and the offset after it
+        length = buf[offset]
+        if length < 0xfd:
+            # the common case, a one byte length
+            offset += 1
+        else:
+            length, offset = read_varint_from(buf, offset)
+        end = offset + length
+        cmds = []
+        while offset < end:
+            current_byte = buf[offset]
+            offset += 1
+            if current_byte >= 1 and current_byte <= 75:
+                data_length = current_byte
+            elif current_byte == 76:
+                data_length = buf[offset]
+                offset += 1
+            elif current_byte == 77:
+                data_length = buf[offset] | buf[offset + 1] << 8
+                offset += 2
+            else:   # operation present
+                cmds.append(current_byte)
+                continue
+            cmds.append(bytes(buf[offset:offset + data_length]))
+            offset += data_length
+        if offset != end:
+            raise SyntaxError('parsing script failed')
+        return cls(cmds), end
+
     def raw_serialize(self):
         result = b''
         for cmd in self.cmds:
@@ -100,35 +150,122 @@ class script:
         total = len(result)
         return encode_varint(total) + result  
 
+    def is_p2sh_script_pubkey(self):
+        # p2sh pattern: OP_HASH160 <20 byte hash> OP_EQUAL
+        return len(self.cmds) == 3 and self.cmds[0] == 0xa9 \
+            and type(self.cmds[1]) == bytes and len(self.cmds[1]) == 20 \
+            and self.cmds[2] == 0x87
+
     # combines the scripts to evalaute them together
     def __add__(self, other):
-        return script(self.cmds + other.cmds) #returns the combined script object
+        return Script(self.cmds + other.cmds) #returns the combined script object
     
 
+    def compile(self):
+        #Compiles the cmds into a CompiledScript that can be run (repeatedly) with run(z)
+        return CompiledScript(self.cmds)
+
     def evaluate(self, z):
-        cmds = self.cmds[:]  
-        stack = []
-        altstack = []
-        while len(cmds) > 0:  
-            cmd = cmds.pop(0)
-            if type(cmd) == int:
-                operation = OP_CODE_FUNCTIONS[cmd]  
-                if cmd in (99, 100):  
-                    if not operation(stack, cmds): 
-                        return False
-                elif cmd in (107, 108):  
-                    if not operation(stack, altstack):
-                        return False
-                elif cmd in (172, 173, 174, 175):  
-                    if not operation(stack, z):
-                        return False
+        return self.compile().run(z)
+
+
+# instruction kinds of a compiled script, each says how the handler is called
+_PUSH = 0        # push the element
+_PLAIN = 1       # operation(stack)
+_ALTSTACK = 2    # operation(stack, altstack)
+_Z = 3           # operation(stack, z)
+_IF = 4          # OP_IF / OP_NOTIF, arg is where the other branch starts (None: no ENDIF)
+_JUMP = 5        # OP_ELSE reached at the end of the taken branch, arg is past the ENDIF
+_NOP = 6         # OP_ENDIF and further OP_ELSEs of the same IF
+_UNKNOWN = 7     # opcode without a handler
+
+
+class CompiledScript:
+    # cmds flattened into (kind, handler, arg) instructions run with an
+    # instruction pointer. handlers are looked up once and IF / ELSE / ENDIF are
+    # matched up front into jump targets, so nothing is popped off the front of
+    # a list or re-scanned while the script runs.
+    # branches behave like op_if / op_notif: an IF fails when the stack is empty
+    # or it has no ENDIF, the element is popped, and only the first ELSE of an
+    # IF switches branches.
+
+    def __init__(self, cmds):
+        self.code = []
+        # per open IF: its instruction index and the index of its ELSE jump
+        open_ifs = []
+        for cmd in cmds:
+            if type(cmd) != int:
+                self.code.append((_PUSH, None, cmd))
+            elif cmd in (99, 100):
+                open_ifs.append([len(self.code), None])
+                # for an IF the handler slot says whether it's OP_NOTIF
+                self.code.append((_IF, cmd == 100, None))
+            elif cmd == 103 and open_ifs:
+                if open_ifs[-1][1] is None:
+                    open_ifs[-1][1] = len(self.code)
+                    self.code.append((_JUMP, None, None))
+                    self._patch(open_ifs[-1][0], len(self.code))
                 else:
-                    if not operation(stack):
-                        return False
+                    self.code.append((_NOP, None, None))
+            elif cmd == 104 and open_ifs:
+                if_index, else_index = open_ifs.pop()
+                self.code.append((_NOP, None, None))
+                if else_index is None:
+                    self._patch(if_index, len(self.code))
+                else:
+                    self._patch(else_index, len(self.code))
+            elif cmd not in OP_CODE_FUNCTIONS:
+                self.code.append((_UNKNOWN, None, cmd))
+            elif cmd in (107, 108):
+                self.code.append((_ALTSTACK, OP_CODE_FUNCTIONS[cmd], None))
+            elif cmd in (172, 173, 174, 175):
+                self.code.append((_Z, OP_CODE_FUNCTIONS[cmd], None))
             else:
-                stack.append(cmd)  
+                self.code.append((_PLAIN, OP_CODE_FUNCTIONS[cmd], None))
+        # an IF without ENDIF fails when it's reached
+        for if_index, _ in open_ifs:
+            self._patch(if_index, None)
+
+    def __len__(self):
+        return len(self.code)
+
+    def _patch(self, index, target):
+        kind, handler, _ = self.code[index]
+        self.code[index] = (kind, handler, target)
+
+    def run(self, z):
+        #Runs the script, True when it ends with a non-empty top element
+        code = self.code
+        size = len(code)
+        stack = []
+        altstack = []
+        ip = 0
+        while ip < size:
+            kind, handler, arg = code[ip]
+            ip += 1
+            if kind == _PUSH:
+                stack.append(arg)
+            elif kind == _PLAIN:
+                if not handler(stack):
+                    return False
+            elif kind == _Z:
+                if not handler(stack, z):
+                    return False
+            elif kind == _IF:
+                if len(stack) < 1 or arg is None:
+                    return False
+                if (decode_number(stack.pop()) == 0) != handler:
+                    ip = arg
+            elif kind == _JUMP:
+                ip = arg
+            elif kind == _ALTSTACK:
+                if not handler(stack, altstack):
+                    return False
+            elif kind == _UNKNOWN:
+                # same error the OP_CODE_FUNCTIONS lookup used to raise
+                raise KeyError(arg)
         if len(stack) == 0:
-            return False  
+            return False
         if stack.pop() == b'':
-            return False  
-        return True  
\ No newline at end of file
+            return False
+        return True
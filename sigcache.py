@@ -0,0 +1,113 @@
+import hashlib
+import os
+import threading
+
+from helper import LRUCache
+
+
+# cache of signatures that already passed verification
+# a transaction is usually checked when it enters the mempool and then again
+# when it shows up in a block, with exactly the same (z, sec, der) for every
+# input. remembering the ones that were valid lets op_checksig skip the
+# elliptic curve math the second time around.
+# only successes are stored, a failure is always recomputed.
+# entries are the sha256 of the triple, so each one is just 32 bytes and the
+# whole cache can be written to disk and loaded back on the next start.
+
+ENTRY_SIZE = 32
+
+
+class SignatureCache:
+
+    def __init__(self, maxsize=100000, path=None):
+        self.path = path
+        self._entries = LRUCache(maxsize=maxsize)
+        # per thread list of keys added since start_collecting(), see verifier
+        self._collected = threading.local()
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __repr__(self):
+        return 'SignatureCache(size={}, maxsize={}, hits={}, misses={})'.format(
+            len(self), self.maxsize, self.hits, self.misses)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def maxsize(self):
+        return self._entries.maxsize
+
+    @property
+    def hits(self):
+        return self._entries.hits
+
+    @property
+    def misses(self):
+        return self._entries.misses
+
+    @staticmethod
+    def key(z, sec, der):
+        # z is the signature hash as an int, sec and der are the raw bytes
+        h = hashlib.sha256(z.to_bytes(32, 'big'))
+        h.update(bytes([len(sec)]))
+        h.update(sec)
+        h.update(der)
+        return h.digest()
+
+    def contains(self, z, sec, der):
+        #whether this exact signature was verified before
+        return self._entries.get(self.key(z, sec, der)) is not None
+
+    def add(self, z, sec, der):
+        #record a signature that verified
+        self.add_key(self.key(z, sec, der))
+
+    def add_key(self, key):
+        #record a signature that verified by its key()
+        self._entries.put(key, True)
+        collected = getattr(self._collected, 'keys', None)
+        if collected is not None:
+            collected.append(key)
+
+    def start_collecting(self):
+        # keys added by this thread from now on are kept for stop_collecting(),
+        # a worker process uses it to hand its new entries back to the parent
+        self._collected.keys = []
+
+    def stop_collecting(self):
+        #returns the keys added since start_collecting()
+        keys = getattr(self._collected, 'keys', None) or []
+        self._collected.keys = None
+        return keys
+
+    def resize(self, maxsize):
+        self._entries.resize(maxsize)
+
+    def clear(self):
+        self._entries.clear()
+
+    def save(self, path=None):
+        #writes the entries (oldest first) as back to back 32 byte records
+        path = path or self.path
+        if path is None:
+            raise ValueError('no path to save the signature cache to')
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(b''.join(self._entries.keys()))
+        # replace the old file only once the new one is complete
+        os.replace(tmp, path)
+
+    def load(self, path=None):
+        #adds the entries of a file written by save()
+        path = path or self.path
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) % ENTRY_SIZE:
+            raise ValueError('corrupt signature cache file: {}'.format(path))
+        for i in range(0, len(data), ENTRY_SIZE):
+            self._entries.put(data[i:i + ENTRY_SIZE], True)
+
+
+# the cache op_checksig consults
+SIGNATURE_CACHE = SignatureCache()
@@ -0,0 +1,74 @@
+from random import Random
+from unittest import TestCase
+
+import ecc
+from ecc import G, GLV_LAMBDA, N, Point, PrivateKey, Signature, glv_decompose, multi_multiply, verify_batch
+
+
+# cross-checks the GLV split used by S256Point.__rmul__ against the
+# plain double-and-add in Point.__rmul__
+
+EDGE_SCALARS = (1, 2, N - 1, GLV_LAMBDA, N - GLV_LAMBDA)
+
+
+class GLVTest(TestCase):
+
+    def setUp(self):
+        rng = Random(2021)
+        self.scalars = list(EDGE_SCALARS) + [rng.randrange(1, N) for _ in range(4)]
+        self.points = [G, PrivateKey(12345).point, PrivateKey(rng.randrange(1, N)).point]
+        self.use_glv = ecc.USE_GLV
+
+    def tearDown(self):
+        ecc.USE_GLV = self.use_glv
+
+    def test_decompose(self):
+        for k in self.scalars + [0, N, 2 * N - 1]:
+            k1, k2 = glv_decompose(k)
+            self.assertEqual((k1 + k2 * GLV_LAMBDA) % N, k % N)
+            self.assertLessEqual(abs(k1).bit_length(), 129)
+            self.assertLessEqual(abs(k2).bit_length(), 129)
+
+    def test_multiply(self):
+        for point in self.points[1:]:
+            for k in self.scalars:
+                expected = Point.__rmul__(point, k)
+                for use_glv in (True, False):
+                    ecc.USE_GLV = use_glv
+                    self.assertEqual(k * point, expected)
+
+    def test_multiply_to_infinity(self):
+        for use_glv in (True, False):
+            ecc.USE_GLV = use_glv
+            point = self.points[1]
+            self.assertIsNone((N * point).x)
+            self.assertEqual((N + 1) * point, point)
+
+    def test_generator(self):
+        for k in self.scalars:
+            self.assertEqual(k * G, Point.__rmul__(G, k))
+
+    def test_multi_multiply(self):
+        # the two-term sum S256Point.verify uses, with G's endomorphism table
+        point = self.points[2]
+        for u, v in zip(self.scalars, reversed(self.scalars)):
+            expected = Point.__rmul__(G, u) + Point.__rmul__(point, v)
+            for use_glv in (True, False):
+                ecc.USE_GLV = use_glv
+                self.assertEqual(multi_multiply([(u, G), (v, point)]), expected)
+
+    def test_verify(self):
+        rng = Random(7)
+        items = []
+        for secret in (1, 12345, rng.randrange(1, N)):
+            key = PrivateKey(secret)
+            z = rng.randrange(1, N)
+            sig = key.sign(z)
+            items.append((key.point, z, sig))
+            items.append((key.point, z + 1, sig))
+            items.append((key.point, z, Signature(sig.r, N - sig.s + 1)))
+        expected = [True, False, False] * 3
+        for use_glv in (True, False):
+            ecc.USE_GLV = use_glv
+            self.assertEqual([point.verify(z, sig) for point, z, sig in items], expected)
+            self.assertEqual(verify_batch(items), expected)
@@ -1,24 +1,66 @@
+from abc import ABC, abstractmethod
+from hashlib import sha256
 from io import BytesIO
+from struct import Struct
 
 from helper import (
+    edit_stamp,
+    EDITS,
     encode_varint,
     hash256,
     int_to_little_endian,
     little_endian_to_int,
     read_varint,
+    read_varint_from,
     SIGHASH_ALL,
+    SIGHASH_EDITS,
+    StampedList,
 )
 
 from script import Script
 
 
+# precompiled little endian unpackers for the buffer parsers
+_unpack_uint32 = Struct('<I').unpack_from
+_unpack_uint64 = Struct('<Q').unpack_from
+
+# serialization caching
+# Tx keeps its serialization (and hash) around: a parsed Tx starts out with the
+# bytes it was parsed from, a built one fills the cache on first serialize().
+# TxIn and TxOut take a fresh helper.edit_stamp() whenever any of their
+# attributes is assigned (tx_in.script_sig = ..., tx_out.amount = ...), the
+# tx_ins / tx_outs lists and Script cmds are StampedLists that do the same on
+# in-place edits. while helper.EDITS hasn't moved since the cache was filled it
+# is used as is; otherwise it's still valid if the stamps of the lists, inputs,
+# outputs and their scripts are those it was made with.
+
+
 class Tx:
 
-    def __init__(self, version, tx_ins, tx_outs, locktime):
-        self.version = version
-        self.tx_ins = tx_ins
-        self.tx_outs = tx_outs
-        self.locktime = locktime
+    def __init__(self, version, tx_ins, tx_outs, locktime, testnet=False):
+        self.__dict__.update(
+            version=version,
+            tx_ins=StampedList(tx_ins),
+            tx_outs=StampedList(tx_outs),
+            locktime=locktime,
+            testnet=testnet,
+            _raw=None,
+        )
+
+    def __setattr__(self, name, value):
+        # replacing version, the input/output lists or locktime drops the cache
+        if name in ('tx_ins', 'tx_outs'):
+            value = StampedList(value)
+        self.__dict__[name] = value
+        self.__dict__['_raw'] = None
+        self.__dict__.pop('_sighash_context', None)
+
+    def __getstate__(self):
+        # caches stay behind: the sighash context holds hashlib states and a
+        # memoryview that can't be pickled, and stamps are per process
+        state = dict(self.__dict__, _raw=None)
+        state.pop('_sighash_context', None)
+        return state
 
     def __repr__(self): #provides a string representation of the transaction object
         tx_ins = ''
@@ -40,13 +82,28 @@ class Tx:
         return self.hash().hex()
 
     def hash(self):
-        #Binary hash of the legacy serialization
-        return hash256(self.serialize())[::-1]
+        #Binary hash of the legacy serialization, cached along with it
+        raw = self.serialize()
+        if self._hash is None:
+            self.__dict__['_hash'] = hash256(raw)[::-1]
+        return self._hash
+
+    def _stamps(self):
+        return tuple(
+            [self.tx_ins.stamp, self.tx_outs.stamp]
+            + [(tx_in._stamp, tx_in.script_sig.stamp) for tx_in in self.tx_ins]
+            + [(tx_out._stamp, tx_out.script_pubkey.stamp) for tx_out in self.tx_outs]
+        )
+
+    def _set_raw(self, raw):
+        # remember raw as the serialization of the tx as it is right now
+        self.__dict__.update(_raw=raw, _raw_edits=EDITS.now, _raw_stamps=self._stamps(), _hash=None)
 
     @classmethod
     def parse(cls, s, testnet=False):
         #Takes a byte stream and parses the transaction at the start return a Tx object
         # s.read(n) will return n bytes
+        start = s.tell() if hasattr(s, 'getbuffer') else None
         # version is an integer in 4 bytes, little-endian
         version = little_endian_to_int(s.read(4))
         # num_inputs is a varint, use read_varint(s)
@@ -64,27 +121,73 @@ class Tx:
         # locktime is an integer in 4 bytes, little-endian
         locktime = little_endian_to_int(s.read(4))
         # return an instance of the class (see __init__ for args)
-        return cls(version, inputs, outputs, locktime, testnet=testnet)
+        tx = cls(version, inputs, outputs, locktime, testnet=testnet)
+        # an in-memory stream still has the bytes we just read, keep them
+        if start is not None:
+            with s.getbuffer() as view:
+                tx._set_raw(bytes(view[start:s.tell()]))
+        return tx
+
+    @classmethod
+    def parse_buffer(cls, buf, offset=0, testnet=False):
+        #Same as parse but works on one buffer with an offset instead of a stream
+        # nothing is read through BytesIO, fields are unpacked in place with
+        # struct.unpack_from and only the bytes that end up in the Tx are copied.
+        # returns the Tx and the offset just after it, so a buffer holding many
+        # transactions back to back (a block, a mempool dump) can be walked
+        if not isinstance(buf, bytes):
+            buf = memoryview(buf)
+        start = offset
+        version = _unpack_uint32(buf, offset)[0]
+        num_inputs, offset = read_varint_from(buf, offset + 4)
+        inputs = []
+        for _ in range(num_inputs):
+            tx_in, offset = TxIn.parse_buffer(buf, offset)
+            inputs.append(tx_in)
+        num_outputs, offset = read_varint_from(buf, offset)
+        outputs = []
+        for _ in range(num_outputs):
+            tx_out, offset = TxOut.parse_buffer(buf, offset)
+            outputs.append(tx_out)
+        locktime = _unpack_uint32(buf, offset)[0]
+        tx = cls(version, inputs, outputs, locktime, testnet=testnet)
+        tx._set_raw(bytes(buf[start:offset + 4]))
+        return tx, offset + 4
+
+    @classmethod
+    def parse_bytes(cls, raw, testnet=False):
+        #Parses a whole serialized transaction given as bytes
+        tx, end = cls.parse_buffer(raw, 0, testnet=testnet)
+        if end != len(raw):
+            raise SyntaxError('{} trailing bytes after transaction'.format(len(raw) - end))
+        return tx
 
     def serialize(self):
         #Returns the byte serialization of the transaction
+        # reuse the cached bytes if nothing changed since they were made
+        raw = self._raw
+        if raw is not None:
+            if self._raw_edits == EDITS.now:
+                return raw
+            edits = EDITS.now
+            if self._raw_stamps == self._stamps():
+                self.__dict__['_raw_edits'] = edits
+                return raw
         # serialize version (4 bytes, little endian)
-        result = int_to_little_endian(self.version, 4)
+        parts = [int_to_little_endian(self.version, 4)]
         # encode_varint on the number of inputs
-        result += encode_varint(len(self.tx_ins))
-        # iterate inputs
-        for tx_in in self.tx_ins:
-            # serialize each input
-            result += tx_in.serialize()
+        parts.append(encode_varint(len(self.tx_ins)))
+        # serialize each input
+        parts.extend(tx_in.serialize() for tx_in in self.tx_ins)
         # encode_varint on the number of outputs
-        result += encode_varint(len(self.tx_outs))
-        # iterate outputs
-        for tx_out in self.tx_outs:
-            # serialize each output
-            result += tx_out.serialize()
+        parts.append(encode_varint(len(self.tx_outs)))
+        # serialize each output
+        parts.extend(tx_out.serialize() for tx_out in self.tx_outs)
         # serialize locktime (4 bytes, little endian)
-        result += int_to_little_endian(self.locktime, 4)
-        return result
+        parts.append(int_to_little_endian(self.locktime, 4))
+        raw = b''.join(parts)
+        self._set_raw(raw)
+        return raw
 
     def fee(self):
         #Returns the fee of this transaction in satoshi
@@ -101,51 +204,39 @@ class Tx:
 
     def sig_hash(self, input_index, redeem_script=None):
         #Returns the integer representation of the hash that needs to get signed for index input_index
-        # start the serialization with version
-        # use int_to_little_endian in 4 bytes
-        s = int_to_little_endian(self.version, 4)
-        # add how many inputs there are using encode_varint
-        s += encode_varint(len(self.tx_ins))
-        # loop through each input using enumerate, so we have the input index
-        for i, tx_in in enumerate(self.tx_ins):
-            # if the input index is the one we're signing
-            if i == input_index:
-                # if the RedeemScript was passed in, that's the ScriptSig
-                if redeem_script:
-                    script_sig = redeem_script
-                # otherwise the previous tx's ScriptPubkey is the ScriptSig
-                else:
-                    script_sig = tx_in.script_pubkey(self.testnet)
-            # Otherwise, the ScriptSig is empty
-            else:
-                script_sig = None
-            # add the serialization of the input with the ScriptSig we want
-            s += TxIn(
-                prev_tx=tx_in.prev_tx,
-                prev_index=tx_in.prev_index,
-                script_sig=script_sig,
-                sequence=tx_in.sequence,
-            ).serialize()
-        # add how many outputs there are using encode_varint
-        s += encode_varint(len(self.tx_outs))
-        # add the serialization of each output
-        for tx_out in self.tx_outs:
-            s += tx_out.serialize()
-        # add the locktime using int_to_little_endian in 4 bytes
-        s += int_to_little_endian(self.locktime, 4)
-        # add SIGHASH_ALL using int_to_little_endian in 4 bytes
-        s += int_to_little_endian(SIGHASH_ALL, 4)
-        # hash256 the serialization
-        h256 = hash256(s)
-        # convert the result to an integer using int.from_bytes(x, 'big')
-        return int.from_bytes(h256, 'big')
-
-    def verify_input(self, input_index):
+        # if the RedeemScript was passed in, that's the ScriptSig
+        if redeem_script:
+            script_sig = redeem_script
+        # otherwise the previous tx's ScriptPubkey is the ScriptSig
+        else:
+            script_sig = self.tx_ins[input_index].script_pubkey(self.testnet)
+        return self.sighash_context().sig_hash(input_index, script_sig)
+
+    def sighash_context(self):
+        #SighashContext for this tx, reused for as long as it still matches
+        # (signing inputs changes ScriptSigs only, so it survives sign_input)
+        # like the serialization cache it's checked against helper.SIGHASH_EDITS
+        # first and only compares its key after an edit somewhere
+        edits = SIGHASH_EDITS.now
+        context = self.__dict__.get('_sighash_context')
+        if context is not None:
+            if context.edits == edits:
+                return context
+            if context.tx_key == SighashContext.key(self):
+                context.edits = edits
+                return context
+        context = SighashContext(self)
+        context.edits = edits
+        self.__dict__['_sighash_context'] = context
+        return context
+
+    def verify_input(self, input_index, script_pubkey=None):
         #Returns whether the input has a valid signature
         # get the relevant input
         tx_in = self.tx_ins[input_index]
-        # grab the previous ScriptPubKey
-        script_pubkey = tx_in.script_pubkey(testnet=self.testnet)
+        # grab the previous ScriptPubKey, unless the caller already has it
+        if script_pubkey is None:
+            script_pubkey = tx_in.script_pubkey(testnet=self.testnet)
         # check to see if the ScriptPubkey is a p2sh using
         # Script.is_p2sh_script_pubkey()
         if script_pubkey.is_p2sh_script_pubkey():
@@ -159,8 +250,9 @@ class Tx:
         else:
             redeem_script = None
         # get the signature hash (z)
-        # pass the RedeemScript to the sig_hash method
-        z = self.sig_hash(input_index, redeem_script)
+        # pass the RedeemScript to the sig_hash method, for anything else the
+        # ScriptPubKey we already have is what goes in, no need to fetch it twice
+        z = self.sig_hash(input_index, redeem_script or script_pubkey)
         # combine the current ScriptSig and the previous ScriptPubKey
         combined = tx_in.script_sig + script_pubkey
         # evaluate the combined script
@@ -220,16 +312,58 @@ class Tx:
         return little_endian_to_int(first_cmd)
 
 
+# where TxIn.value / script_pubkey / fetch_tx get previous transactions from
+# anything with fetch_tx(tx_id, testnet) works, subclass PrevoutProvider and
+# override get_prevout as well if outputs can be looked up without the whole tx
+# (txstore.TxStore is a local on-disk implementation)
+class PrevoutProvider(ABC):
+
+    @abstractmethod
+    def fetch_tx(self, tx_id, testnet=False):
+        #Returns the Tx whose hash() is tx_id
+        pass
+
+    def get_prevout(self, tx_id, index, testnet=False):
+        #Returns output number index of transaction tx_id
+        return self.fetch_tx(tx_id, testnet=testnet).tx_outs[index]
+
+
+_prevout_provider = None
+
+
+def set_prevout_provider(provider):
+    #Sets the provider every TxIn looks its previous outputs up in (None to unset)
+    global _prevout_provider
+    _prevout_provider = provider
+
+
+def get_prevout_provider():
+    if _prevout_provider is None:
+        raise RuntimeError('no prevout provider, call tx.set_prevout_provider() first')
+    return _prevout_provider
+
+
 class TxIn:
 
     def __init__(self, prev_tx, prev_index, script_sig=None, sequence=0xffffffff):
-        self.prev_tx = prev_tx
-        self.prev_index = prev_index
         if script_sig is None:
-            self.script_sig = Script()
-        else:
-            self.script_sig = script_sig
-        self.sequence = sequence
+            script_sig = Script()
+        # set in one go, going through __setattr__ four times slows parsing down
+        self.__dict__.update(
+            prev_tx=prev_tx,
+            prev_index=prev_index,
+            script_sig=script_sig,
+            sequence=sequence,
+            _serialized=None,
+            _stamp=0,
+        )
+
+    def __setattr__(self, name, value):
+        # any change gets a new stamp and drops the cached serialization
+        self.__dict__[name] = value
+        self.__dict__['_serialized'] = None
+        # a new ScriptSig doesn't change any signature hash
+        self.__dict__['_stamp'] = edit_stamp(sighash=name != 'script_sig')
 
     def __repr__(self):
         return '{}:{}'.format(
@@ -237,6 +371,10 @@ class TxIn:
             self.prev_index,
         )
 
+    def __setstate__(self, state):
+        # stamps only mean something inside one process, start over after unpickling
+        self.__dict__.update(state, _serialized=None, _stamp=0)
+
     @classmethod
     def parse(cls, s):
         #Takes a byte stream and parses the tx_input at the start return a TxIn object
@@ -251,43 +389,75 @@ class TxIn:
         # return an instance of the class (see __init__ for args)
         return cls(prev_tx, prev_index, script_sig, sequence)
 
+    @classmethod
+    def parse_buffer(cls, buf, offset):
+        #Buffer/offset version of parse, returns the TxIn and the offset after it
+        # prev_tx is 32 bytes, little endian, reversed while copying
+        prev_tx = bytes(buf[offset:offset + 32][::-1])
+        prev_index = _unpack_uint32(buf, offset + 32)[0]
+        script_sig, offset = Script.parse_buffer(buf, offset + 36)
+        sequence = _unpack_uint32(buf, offset)[0]
+        return cls(prev_tx, prev_index, script_sig, sequence), offset + 4
+
     def serialize(self):
         #Returns the byte serialization of the transaction input
-        # serialize prev_tx, little endian
-        result = self.prev_tx[::-1]
-        # serialize prev_index, 4 bytes, little endian
-        result += int_to_little_endian(self.prev_index, 4)
-        # serialize the script_sig
-        result += self.script_sig.serialize()
-        # serialize sequence, 4 bytes, little endian
-        result += int_to_little_endian(self.sequence, 4)
+        script_stamp = self.script_sig.stamp
+        if self._serialized is not None and self._serialized_script == script_stamp:
+            return self._serialized
+        result = b''.join((
+            # serialize prev_tx, little endian
+            self.prev_tx[::-1],
+            # serialize prev_index, 4 bytes, little endian
+            int_to_little_endian(self.prev_index, 4),
+            # serialize the script_sig
+            self.script_sig.serialize(),
+            # serialize sequence, 4 bytes, little endian
+            int_to_little_endian(self.sequence, 4),
+        ))
+        self.__dict__.update(_serialized=result, _serialized_script=script_stamp)
         return result
 
 
+    def fetch_tx(self, testnet=False):
+        #Get the previous transaction from the prevout provider
+        return get_prevout_provider().fetch_tx(self.prev_tx, testnet=testnet)
+
+    def prev_output(self, testnet=False):
+        #Get the TxOut this input spends from the prevout provider
+        return get_prevout_provider().get_prevout(self.prev_tx, self.prev_index, testnet=testnet)
+
     def value(self, testnet=False):
         #Get the outpoint value by looking up the tx hash Returns the amount in satoshi
-        # use self.fetch_tx to get the transaction
-        tx = self.fetch_tx(testnet=testnet)
-        # get the output at self.prev_index
-        return tx.tx_outs[self.prev_index].amount
+        return self.prev_output(testnet=testnet).amount
 
     def script_pubkey(self, testnet=False):
         #Get the ScriptPubKey by looking up the tx hash Returns a Script object
-        # use self.fetch_tx to get the transaction
-        tx = self.fetch_tx(testnet=testnet)
-        # get the output at self.prev_index
-        return tx.tx_outs[self.prev_index].script_pubkey
+        return self.prev_output(testnet=testnet).script_pubkey
 
 
 class TxOut:
 
     def __init__(self, amount, script_pubkey):
-        self.amount = amount
-        self.script_pubkey = script_pubkey
+        self.__dict__.update(
+            amount=amount,
+            script_pubkey=script_pubkey,
+            _serialized=None,
+            _stamp=0,
+        )
+
+    def __setattr__(self, name, value):
+        # any change gets a new stamp and drops the cached serialization
+        self.__dict__[name] = value
+        self.__dict__['_serialized'] = None
+        self.__dict__['_stamp'] = edit_stamp()
 
     def __repr__(self):
         return '{}:{}'.format(self.amount, self.script_pubkey)
 
+    def __setstate__(self, state):
+        # stamps only mean something inside one process, start over after unpickling
+        self.__dict__.update(state, _serialized=None, _stamp=0)
+
     @classmethod
     def parse(cls, s):
         #Takes a byte stream and parses the tx_output at the start return a TxOut object
@@ -297,11 +467,251 @@ class TxOut:
         script_pubkey = Script.parse(s)
         return cls(amount, script_pubkey)
 
+    @classmethod
+    def parse_buffer(cls, buf, offset):
+        #Buffer/offset version of parse, returns the TxOut and the offset after it
+        amount = _unpack_uint64(buf, offset)[0]
+        script_pubkey, offset = Script.parse_buffer(buf, offset + 8)
+        return cls(amount, script_pubkey), offset
+
     def serialize(self):
         #Returns the byte serialization of the transaction output
-        # serialize amount, 8 bytes, little endian
-        result = int_to_little_endian(self.amount, 8)
-        # serialize the script_pubkey
-        result += self.script_pubkey.serialize()
+        script_stamp = self.script_pubkey.stamp
+        if self._serialized is not None and self._serialized_script == script_stamp:
+            return self._serialized
+        # serialize amount, 8 bytes, little endian, then the script_pubkey
+        result = int_to_little_endian(self.amount, 8) + self.script_pubkey.serialize()
+        self.__dict__.update(_serialized=result, _serialized_script=script_stamp)
         return result
 
+
+class SighashContext:
+    # the legacy SIGHASH_ALL preimage for input i is
+    #   version | #inputs | input 0 .. input n-1 | #outputs | outputs | locktime | hash type
+    # where input i carries the script being signed and every other input has
+    # an empty ScriptSig. everything except that one script is the same for
+    # all inputs, so it is serialized once here:
+    #   - the inputs with empty ScriptSigs are 41 bytes each and sit back to
+    #     back in one buffer, the part after input i is a memoryview slice of it
+    #   - outputs, locktime and hash type are one precomputed suffix
+    #   - the sha256 state after "version | #inputs | inputs before i" is kept
+    #     for every i, so that prefix is never hashed twice
+    # signing or verifying all n inputs no longer re-serializes the whole tx n times.
+
+    EMPTY_INPUT_SIZE = 41
+
+    def __init__(self, tx, key=None):
+        self.tx_key = key if key is not None else self.key(tx)
+        self.heads = []
+        self.tails = []
+        empty = []
+        for tx_in in tx.tx_ins:
+            head = tx_in.prev_tx[::-1] + int_to_little_endian(tx_in.prev_index, 4)
+            tail = int_to_little_endian(tx_in.sequence, 4)
+            self.heads.append(head)
+            self.tails.append(tail)
+            empty.append(head + b'\x00' + tail)
+        self.empty_inputs = memoryview(b''.join(empty))
+        self.suffix = b''.join(
+            [encode_varint(len(tx.tx_outs))]
+            + [tx_out.serialize() for tx_out in tx.tx_outs]
+            + [int_to_little_endian(tx.locktime, 4), int_to_little_endian(SIGHASH_ALL, 4)]
+        )
+        self.midstates = [sha256(int_to_little_endian(tx.version, 4) + encode_varint(len(tx.tx_ins)))]
+
+    @staticmethod
+    def key(tx):
+        # what the preimages depend on, besides the script being signed
+        return (
+            tx.version,
+            tx.locktime,
+            tuple([(tx_in.prev_tx, tx_in.prev_index, tx_in.sequence) for tx_in in tx.tx_ins]),
+            tx.tx_outs.stamp,
+            tuple([(tx_out._stamp, tx_out.script_pubkey.stamp) for tx_out in tx.tx_outs]),
+        )
+
+    def _midstate(self, input_index):
+        # sha256 state after everything that comes before input input_index
+        size = self.EMPTY_INPUT_SIZE
+        while len(self.midstates) <= input_index:
+            i = len(self.midstates) - 1
+            state = self.midstates[-1].copy()
+            state.update(self.empty_inputs[i * size:(i + 1) * size])
+            self.midstates.append(state)
+        return self.midstates[input_index].copy()
+
+    def sig_hash(self, input_index, script_sig):
+        #signature hash of input input_index with script_sig (a Script) in its place
+        h = self._midstate(input_index)
+        h.update(self.heads[input_index])
+        h.update(script_sig.serialize())
+        h.update(self.tails[input_index])
+        h.update(self.empty_inputs[(input_index + 1) * self.EMPTY_INPUT_SIZE:])
+        h.update(self.suffix)
+        # second round of sha256 for hash256
+        return int.from_bytes(sha256(h.digest()).digest(), 'big')
+
+
+class _LazySequence:
+    # read-only list look-alike that builds item i with factory(i) the first
+    # time it is asked for, and keeps it after that
+
+    def __init__(self, count, factory):
+        self._items = [None] * count
+        self._factory = factory
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self._items)))]
+        item = self._items[index]
+        if item is None:
+            if index < 0:
+                index += len(self._items)
+            item = self._items[index] = self._factory(index)
+        return item
+
+    def __iter__(self):
+        for i in range(len(self._items)):
+            yield self[i]
+
+
+class LazyTx:
+    # a transaction that is only parsed as far as it is used
+    # the first access walks the raw bytes once and only records where every
+    # input and output starts, without building any TxIn/TxOut/Script.
+    # tx_ins[i] / tx_outs[j] are parsed when asked for, output amounts and raw
+    # scripts can be read without building objects at all, and the txid is
+    # hashed straight from the original bytes.
+
+    def __init__(self, raw, testnet=False):
+        self.raw = raw
+        self.testnet = testnet
+        self._buf = raw if isinstance(raw, bytes) else memoryview(raw)
+        self._in_offsets = None
+        self._out_offsets = None
+        self._end = None
+        self._tx_ins = None
+        self._tx_outs = None
+        self._hash = None
+
+    @classmethod
+    def from_buffer(cls, buf, offset=0, testnet=False):
+        #Lazy view of the transaction at offset in buf, returns it and the offset after it
+        buf = buf if isinstance(buf, bytes) else memoryview(buf)
+        end = cls._scan_buffer(buf, offset)[2]
+        lazy = cls(buf[offset:end], testnet=testnet)
+        return lazy, end
+
+    def __repr__(self):
+        return 'LazyTx({})'.format(self.id())
+
+    @staticmethod
+    def _scan_buffer(buf, offset):
+        # returns the input offsets, output offsets and end of the tx at offset
+        num_inputs, offset = read_varint_from(buf, offset + 4)
+        in_offsets = []
+        for _ in range(num_inputs):
+            in_offsets.append(offset)
+            # prev_tx + prev_index, then the script_sig, then the sequence
+            length, offset = read_varint_from(buf, offset + 36)
+            offset += length + 4
+        num_outputs, offset = read_varint_from(buf, offset)
+        out_offsets = []
+        for _ in range(num_outputs):
+            out_offsets.append(offset)
+            length, offset = read_varint_from(buf, offset + 8)
+            offset += length
+        if offset + 4 > len(buf):
+            raise SyntaxError('transaction runs past the end of the buffer')
+        return in_offsets, out_offsets, offset + 4
+
+    def _scan(self):
+        if self._in_offsets is None:
+            self._in_offsets, self._out_offsets, self._end = self._scan_buffer(self._buf, 0)
+            if self._end != len(self._buf):
+                raise SyntaxError('{} trailing bytes after transaction'.format(len(self._buf) - self._end))
+
+    @property
+    def version(self):
+        return _unpack_uint32(self._buf, 0)[0]
+
+    @property
+    def locktime(self):
+        self._scan()
+        return _unpack_uint32(self._buf, self._end - 4)[0]
+
+    @property
+    def tx_ins(self):
+        if self._tx_ins is None:
+            self._scan()
+            self._tx_ins = _LazySequence(
+                len(self._in_offsets),
+                lambda i: TxIn.parse_buffer(self._buf, self._in_offsets[i])[0],
+            )
+        return self._tx_ins
+
+    @property
+    def tx_outs(self):
+        if self._tx_outs is None:
+            self._scan()
+            self._tx_outs = _LazySequence(
+                len(self._out_offsets),
+                lambda i: TxOut.parse_buffer(self._buf, self._out_offsets[i])[0],
+            )
+        return self._tx_outs
+
+    def num_inputs(self):
+        self._scan()
+        return len(self._in_offsets)
+
+    def num_outputs(self):
+        self._scan()
+        return len(self._out_offsets)
+
+    def output_amount(self, index):
+        #amount of output index in satoshi, without building the TxOut
+        self._scan()
+        return _unpack_uint64(self._buf, self._out_offsets[index])[0]
+
+    def output_amounts(self):
+        self._scan()
+        return [_unpack_uint64(self._buf, offset)[0] for offset in self._out_offsets]
+
+    def raw_script_pubkey(self, index):
+        #the ScriptPubKey of output index as raw bytes (no length prefix), unparsed
+        self._scan()
+        offset = self._out_offsets[index]
+        length, start = read_varint_from(self._buf, offset + 8)
+        return bytes(self._buf[start:start + length])
+
+    def prev_outpoint(self, index):
+        #(prev_tx, prev_index) of input index, without parsing its ScriptSig
+        self._scan()
+        offset = self._in_offsets[index]
+        return bytes(self._buf[offset:offset + 32][::-1]), _unpack_uint32(self._buf, offset + 32)[0]
+
+    def serialize(self):
+        return bytes(self._buf)
+
+    def hash(self):
+        #Binary hash of the original bytes, nothing is re-serialized
+        if self._hash is None:
+            self._hash = hash256(self._buf)[::-1]
+        return self._hash
+
+    def id(self):
+        return self.hash().hex()
+
+    def is_coinbase(self):
+        self._scan()
+        if len(self._in_offsets) != 1:
+            return False
+        prev_tx, prev_index = self.prev_outpoint(0)
+        return prev_tx == b'\x00' * 32 and prev_index == 0xffffffff
+
+    def to_tx(self):
+        #Fully parsed Tx with the same content
+        return Tx.parse_bytes(self._buf, testnet=self.testnet)
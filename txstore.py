@@ -0,0 +1,131 @@
+import os
+import struct
+import threading
+
+from helper import hash256, LRUCache
+from tx import LazyTx, PrevoutProvider, Tx
+
+
+# local, offline store of raw transactions keyed by txid
+# two append-only files:
+#   <path>      raw transactions back to back
+#   <path>.idx  one 44 byte record per transaction: txid, offset, length
+# the index is read into a dict when the store is opened, lookups are then a
+# single read at a known offset, and recently used transactions are kept
+# parsed in an LRU in front of the file.
+# if the process died between writing a transaction and its index record, the
+# missing records are rebuilt on open by scanning the tail of the data file.
+
+_INDEX_RECORD = struct.Struct('<32sQI')
+
+
+class TxStore(PrevoutProvider):
+
+    def __init__(self, path, cache_size=1024):
+        self.path = path
+        self.index_path = path + '.idx'
+        self.cache = LRUCache(maxsize=cache_size)
+        self._lock = threading.Lock()
+        self._index = {}
+        self._data = open(path, 'a+b')
+        self._index_file = open(self.index_path, 'a+b')
+        self._load_index()
+
+    def __repr__(self):
+        return 'TxStore({!r}, transactions={})'.format(self.path, len(self))
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, tx_id):
+        return tx_id in self._index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._data.close()
+            self._index_file.close()
+
+    def _load_index(self):
+        self._index_file.seek(0)
+        data = self._index_file.read()
+        data_size = os.fstat(self._data.fileno()).st_size
+        end = 0
+        size = _INDEX_RECORD.size
+        usable = len(data) - len(data) % size
+        for pos in range(0, usable, size):
+            tx_id, offset, length = _INDEX_RECORD.unpack_from(data, pos)
+            if offset + length > data_size:
+                # record for data that never made it to disk
+                usable = pos
+                break
+            self._index[tx_id] = (offset, length)
+            end = max(end, offset + length)
+        if usable != len(data):
+            self._index_file.truncate(usable)
+        if end < data_size:
+            self._reindex_from(end, data_size)
+
+    def _reindex_from(self, offset, data_size):
+        # index transactions written to the data file without an index record
+        self._data.seek(offset)
+        buf = self._data.read(data_size - offset)
+        pos = 0
+        while pos < len(buf):
+            try:
+                lazy, end = LazyTx.from_buffer(buf, pos)
+            except (IndexError, SyntaxError, struct.error):
+                # a partially written transaction, cut it off
+                self._data.truncate(offset + pos)
+                break
+            self._append_index(lazy.hash(), offset + pos, end - pos)
+            pos = end
+
+    def _append_index(self, tx_id, offset, length):
+        self._index_file.seek(0, os.SEEK_END)
+        self._index_file.write(_INDEX_RECORD.pack(tx_id, offset, length))
+        self._index[tx_id] = (offset, length)
+
+    def add(self, tx):
+        #Stores a Tx, returns its txid (bytes)
+        return self.add_raw(tx.serialize())
+
+    def add_raw(self, raw):
+        #Stores a serialized transaction, returns its txid (bytes)
+        raw = bytes(raw)
+        tx_id = hash256(raw)[::-1]
+        with self._lock:
+            if tx_id in self._index:
+                return tx_id
+            self._data.seek(0, os.SEEK_END)
+            offset = self._data.tell()
+            self._data.write(raw)
+            self._data.flush()
+            self._append_index(tx_id, offset, len(raw))
+            self._index_file.flush()
+        return tx_id
+
+    def get_raw(self, tx_id):
+        #The serialized transaction, KeyError if it isn't stored
+        offset, length = self._index[tx_id]
+        with self._lock:
+            self._data.seek(offset)
+            return self._data.read(length)
+
+    def fetch_tx(self, tx_id, testnet=False):
+        #Returns the stored Tx with id tx_id (the same bytes as TxIn.prev_tx)
+        # the same Tx object is handed out while it is cached, don't modify it
+        key = (tx_id, testnet)
+        tx = self.cache.get(key)
+        if tx is None:
+            raw = self.get_raw(tx_id)
+            tx = Tx.parse_bytes(raw, testnet=testnet)
+            if tx.hash() != tx_id:
+                raise ValueError('store is corrupt, got {} instead of {}'.format(tx.id(), tx_id.hex()))
+            self.cache.put(key, tx)
+        return tx
@@ -0,0 +1,242 @@
+import mmap
+import os
+from struct import Struct
+
+from tx import PrevoutProvider, TxOut
+from script import Script
+
+
+# the set of unspent transaction outputs
+# only what's needed to spend an output is kept, packed into bytes:
+#   key   = txid (32 bytes) + output index (4 bytes, little endian)
+#   value = amount (8 bytes, little endian) + serialized script_pubkey
+# (the value is exactly TxOut.serialize(), so nothing has to be re-encoded).
+# on top of the in-memory dict the set can sit on a snapshot file that is
+# mmap'ed instead of loaded: the snapshot keeps a sorted table of fixed size
+# (key, offset) records that is binary searched in place, so entries that
+# live in the snapshot cost no python memory until they're spent.
+# plug it into TxIn.value / script_pubkey with tx.set_prevout_provider(utxo_set).
+
+_INDEX = Struct('<I')
+_HEADER = Struct('<4sQ')
+_RECORD = Struct('<36sQ')
+MAGIC = b'UTXO'
+
+
+class TxUnavailableError(LookupError):
+    # raised by UTXOSet.fetch_tx, the set never has whole transactions
+    pass
+
+
+def outpoint_key(tx_id, index):
+    return tx_id + _INDEX.pack(index)
+
+
+class _Snapshot:
+    # read-only view of a file written by UTXOSet.save
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self.map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = _HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError('{} is not a utxo snapshot'.format(path))
+        self.table_start = _HEADER.size
+
+    def close(self):
+        self.map.close()
+        self._file.close()
+
+    def _record(self, i):
+        return _RECORD.unpack_from(self.map, self.table_start + i * _RECORD.size)
+
+    def _value_end(self, i):
+        if i + 1 < self.count:
+            return self._record(i + 1)[1]
+        return len(self.map)
+
+    def get(self, key):
+        # binary search over the sorted key table
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            record_key, offset = self._record(mid)
+            if record_key < key:
+                lo = mid + 1
+            elif record_key > key:
+                hi = mid
+            else:
+                return self.map[offset:self._value_end(mid)]
+        return None
+
+    def items(self):
+        for i in range(self.count):
+            key, offset = self._record(i)
+            yield key, self.map[offset:self._value_end(i)]
+
+
+class UTXOSet(PrevoutProvider):
+
+    def __init__(self):
+        self._entries = {}
+        self._snapshot = None
+        # snapshot entries that have been spent since it was opened
+        self._spent = set()
+
+    def __repr__(self):
+        return 'UTXOSet(outputs={})'.format(len(self))
+
+    def __len__(self):
+        base = self._snapshot.count - len(self._spent) if self._snapshot else 0
+        return len(self._entries) + base
+
+    def __contains__(self, outpoint):
+        #outpoint is a (txid, index) pair
+        return self._get(outpoint_key(*outpoint)) is not None
+
+    def _get(self, key):
+        value = self._entries.get(key)
+        if value is None and self._snapshot is not None and key not in self._spent:
+            value = self._snapshot.get(key)
+        return value
+
+    def _put(self, key, value):
+        if key in self._spent and self._snapshot.get(key) == value:
+            # putting back a snapshot entry that was spent (undo)
+            self._spent.discard(key)
+            return
+        self._entries[key] = value
+
+    def _pop(self, key):
+        value = self._entries.pop(key, None)
+        if value is None and self._snapshot is not None and key not in self._spent:
+            value = self._snapshot.get(key)
+            if value is not None:
+                self._spent.add(key)
+        if value is None:
+            raise KeyError('output {}:{} is not in the utxo set'.format(
+                key[:32].hex(), _INDEX.unpack(key[32:])[0]))
+        return value
+
+    def get(self, tx_id, index):
+        #(amount, raw script_pubkey) of the output, or None if it isn't unspent
+        value = self._get(outpoint_key(tx_id, index))
+        if value is None:
+            return None
+        length = value[8]
+        if length < 0xfd:
+            script = bytes(value[9:9 + length])
+        else:
+            script = Script.parse_buffer(value, 8)[0].raw_serialize()
+        return int.from_bytes(value[:8], 'little'), script
+
+    def fetch_tx(self, tx_id, testnet=False):
+        # TxIn.fetch_tx needs whole transactions, a TxStore provides those
+        raise TxUnavailableError(
+            'the utxo set only holds unspent outputs, use a txstore.TxStore '
+            'as the prevout provider to fetch transaction {}'.format(tx_id.hex()))
+
+    def get_prevout(self, tx_id, index, testnet=False):
+        #TxOut for TxIn.value / script_pubkey, KeyError if it isn't unspent
+        value = self._get(outpoint_key(tx_id, index))
+        if value is None:
+            raise KeyError('output {}:{} is not in the utxo set'.format(tx_id.hex(), index))
+        script_pubkey, _ = Script.parse_buffer(value, 8)
+        return TxOut(int.from_bytes(value[:8], 'little'), script_pubkey)
+
+    def add(self, tx_id, index, tx_out):
+        self._put(outpoint_key(tx_id, index), tx_out.serialize())
+
+    def spend(self, tx_id, index):
+        #removes the output and returns its packed value (for undo data)
+        return self._pop(outpoint_key(tx_id, index))
+
+    def apply_block(self, txs):
+        #Spends the inputs and adds the outputs of txs, in order
+        # returns the undo data (the spent entries) for undo_block. if an input
+        # spends something that isn't there everything done so far is rolled
+        # back and KeyError is raised, the set is never left half updated
+        txs = list(txs)
+        spent = []
+        for applied, tx in enumerate(txs):
+            spent_before = len(spent)
+            try:
+                if not tx.is_coinbase():
+                    for tx_in in tx.tx_ins:
+                        key = outpoint_key(tx_in.prev_tx, tx_in.prev_index)
+                        spent.append((key, self._pop(key)))
+            except KeyError:
+                # put back the inputs of this tx, then undo the complete ones
+                for key, value in reversed(spent[spent_before:]):
+                    self._put(key, value)
+                self._rollback(txs[:applied], spent[:spent_before])
+                raise
+            tx_id = tx.hash()
+            for index, tx_out in enumerate(tx.tx_outs):
+                self._put(outpoint_key(tx_id, index), tx_out.serialize())
+        return spent
+
+    def undo_block(self, txs, undo):
+        #Reverts apply_block(txs), given the undo data it returned
+        self._rollback(list(txs), undo)
+
+    def _rollback(self, txs, spent):
+        # walk the txs backwards: drop the outputs each one created, then put
+        # back what it spent (an output made and spent in the same block
+        # comes back and is dropped again, in the right order)
+        end = len(spent)
+        for tx in reversed(txs):
+            tx_id = tx.hash()
+            for index in range(len(tx.tx_outs)):
+                key = outpoint_key(tx_id, index)
+                if self._entries.pop(key, None) is None and self._snapshot is not None \
+                        and key not in self._spent and self._snapshot.get(key) is not None:
+                    self._spent.add(key)
+            if not tx.is_coinbase():
+                start = end - len(tx.tx_ins)
+                for key, value in reversed(spent[start:end]):
+                    self._put(key, value)
+                end = start
+
+    def items(self):
+        #(key, packed value) for every unspent output
+        yield from self._entries.items()
+        if self._snapshot is not None:
+            for key, value in self._snapshot.items():
+                if key not in self._spent and key not in self._entries:
+                    yield key, value
+
+    def save(self, path):
+        #Writes a snapshot file that open() can mmap
+        entries = sorted(self.items())
+        offset = _HEADER.size + len(entries) * _RECORD.size
+        table = []
+        for key, value in entries:
+            table.append(_RECORD.pack(key, offset))
+            offset += len(value)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, len(entries)))
+            f.write(b''.join(table))
+            for _, value in entries:
+                f.write(value)
+        os.replace(tmp, path)
+
+    @classmethod
+    def open(cls, path, use_mmap=True):
+        #Loads a snapshot, mmap'ed (default) or read completely into memory
+        utxo_set = cls()
+        snapshot = _Snapshot(path)
+        if use_mmap:
+            utxo_set._snapshot = snapshot
+        else:
+            utxo_set._entries = {key: bytes(value) for key, value in snapshot.items()}
+            snapshot.close()
+        return utxo_set
+
+    def close(self):
+        #Releases the snapshot file, entries still held in it become unavailable
+        if self._snapshot is not None:
+            self._snapshot.close()
+            self._snapshot = None
+            self._spent.clear()
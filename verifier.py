@@ -0,0 +1,145 @@
+import struct
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from io import BytesIO
+
+from script import Script
+from sigcache import SIGNATURE_CACHE
+from tx import Tx
+
+
+# parallel transaction verification
+# Tx.verify checks one input after the other on a single core. here every
+# input becomes a small picklable work item
+#   (item id, raw tx bytes, testnet, input index, raw script_pubkey)
+# and chunks of them are sent to a pool of worker processes.
+# previous outputs are looked up in this process (that's cheap), the workers
+# only do the script evaluation / ECDSA math (that's the expensive part).
+# results always come back in the order the transactions were given,
+# no matter which worker finished first.
+# signatures a worker verified are added to the signature cache of this
+# process too, so checking the same tx again later hits the cache.
+
+# how many inputs go to a worker in one go
+DEFAULT_CHUNK_SIZE = 32
+
+_INPUT_ERRORS = (ValueError, SyntaxError, IndexError, TypeError, KeyError, struct.error)
+
+
+def _verify_chunk(items):
+    # runs inside a worker process
+    # anything that makes an input unparseable or unevaluable (including
+    # opcodes without a handler, KeyError) is a failed input, not a crash
+    results = []
+    parsed = {}
+    SIGNATURE_CACHE.start_collecting()
+    for item_id, raw_tx, testnet, input_index, raw_script_pubkey in items:
+        try:
+            # inputs of the same tx usually end up in the same chunk, parse it once
+            tx = parsed.get(raw_tx)
+            if tx is None:
+                tx = parsed[raw_tx] = Tx.parse(BytesIO(raw_tx), testnet=testnet)
+            script_pubkey = Script.parse(BytesIO(raw_script_pubkey))
+            ok = tx.verify_input(input_index, script_pubkey)
+        except _INPUT_ERRORS:
+            ok = False
+        results.append((item_id, bool(ok)))
+    return results, SIGNATURE_CACHE.stop_collecting()
+
+
+class ParallelVerifier:
+
+    def __init__(self, max_workers=None, chunk_size=DEFAULT_CHUNK_SIZE, executor=None):
+        # an existing executor can be passed in, otherwise a process pool
+        # with max_workers (default: one per cpu) is started and owned by us
+        self.chunk_size = chunk_size
+        self._owns_executor = executor is None
+        if executor is None:
+            executor = ProcessPoolExecutor(max_workers=max_workers)
+        self.executor = executor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self._owns_executor:
+            self.executor.shutdown(cancel_futures=True)
+
+    def _work_items(self, txs, results):
+        # builds the work items, txs that already fail here get results[i] = False
+        items = []
+        for tx_index, tx in enumerate(txs):
+            try:
+                # check that we're not creating money
+                if tx.fee() < 0:
+                    results[tx_index] = False
+                    continue
+                raw_tx = tx.serialize()
+                for input_index, tx_in in enumerate(tx.tx_ins):
+                    script_pubkey = tx_in.script_pubkey(testnet=tx.testnet)
+                    items.append((
+                        (tx_index, input_index),
+                        raw_tx,
+                        tx.testnet,
+                        input_index,
+                        script_pubkey.serialize(),
+                    ))
+            except _INPUT_ERRORS:
+                results[tx_index] = False
+        return items
+
+    def verify_transactions(self, txs, stop_on_failure=True):
+        #Returns a list with True/False for each transaction, in the same order
+        # with stop_on_failure the first invalid input cancels everything still
+        # queued, transactions that didn't get a verdict by then are left as None
+        txs = list(txs)
+        results = [None] * len(txs)
+        items = self._work_items(txs, results)
+        if stop_on_failure and False in results:
+            return results
+        pending = set()
+        for i in range(0, len(items), self.chunk_size):
+            chunk = [item for item in items[i:i + self.chunk_size] if results[item[0][0]] is None]
+            if chunk:
+                pending.add(self.executor.submit(_verify_chunk, chunk))
+        remaining = [0] * len(txs)
+        for item in items:
+            remaining[item[0][0]] += 1
+        failed = False
+        while pending and not failed:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk_results, verified = future.result()
+                for key in verified:
+                    SIGNATURE_CACHE.add_key(key)
+                for (tx_index, _), ok in chunk_results:
+                    if results[tx_index] is False:
+                        continue
+                    if not ok:
+                        results[tx_index] = False
+                        failed = stop_on_failure
+                        continue
+                    remaining[tx_index] -= 1
+                    if remaining[tx_index] == 0:
+                        results[tx_index] = True
+        if failed:
+            for future in pending:
+                future.cancel()
+            return results
+        # transactions without any inputs have nothing left to check
+        for tx_index in range(len(txs)):
+            if results[tx_index] is None and remaining[tx_index] == 0:
+                results[tx_index] = True
+        return results
+
+    def verify_transaction(self, tx):
+        #Verify a single transaction with its inputs spread over the workers
+        return self.verify_transactions([tx])[0] is True
+
+
+def verify_transactions(txs, max_workers=None, stop_on_failure=True):
+    #one-shot helper, starts a pool, verifies txs and shuts the pool down
+    with ParallelVerifier(max_workers=max_workers) as verifier:
+        return verifier.verify_transactions(txs, stop_on_failure=stop_on_failure)